@@ -0,0 +1,118 @@
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Annotated, Any
+from fastapi import Depends
+from pydantic import BaseModel
+
+
+# cache config (will be split to config file)
+user_cache_size: int = int(os.getenv("USER_CACHE_SIZE", "10000"))
+user_cache_ttl: float = float(os.getenv("USER_CACHE_TTL", "300"))
+
+
+class CacheStats(BaseModel):
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    size: int | None = None
+
+
+class CacheBackend(ABC):
+    """
+    Interface of cache backend storing serialized values (bytes) with TTL.
+    """
+    def __init__(self):
+        self.stats = CacheStats()
+
+    @abstractmethod
+    async def get(self, key: str) -> bytes | None:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+
+class LRUCache(CacheBackend):
+    """
+    In-process LRU cache bounded by 'maxsize' entries, each entry expires after 'ttl' seconds.
+    """
+    def __init__(self, maxsize: int, ttl: float):
+        super().__init__()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+
+    async def get(self, key: str) -> bytes | None:
+        entry = self._data.get(key)
+        if entry is None:
+            self.stats.misses += 1
+            return None
+
+        expire_at, value = entry
+        if expire_at <= time.monotonic():
+            del self._data[key]
+            self.stats.expirations += 1
+            self.stats.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.stats.hits += 1
+        return value
+
+    async def set(self, key: str, value: bytes) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.stats.evictions += 1
+
+    async def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    @property
+    def size(self) -> int:
+        return len(self._data)
+
+
+class RedisCache(CacheBackend):
+    """
+    Cache backend for Redis-like async client which has get(), set(ex=) and delete().
+    Eviction is done by the server, so 'evictions' is not counted here.
+    """
+    def __init__(self, client: Any, ttl: float, prefix: str = "cache:"):
+        super().__init__()
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def get(self, key: str) -> bytes | None:
+        value = await self.client.get(f"{self.prefix}{key}")
+        if value is None:
+            self.stats.misses += 1
+            return None
+
+        self.stats.hits += 1
+        return value
+
+    async def set(self, key: str, value: bytes) -> None:
+        await self.client.set(f"{self.prefix}{key}", value, ex=max(1, int(self.ttl)))
+
+    async def delete(self, key: str) -> None:
+        await self.client.delete(f"{self.prefix}{key}")
+
+
+# replace with app.dependency_overrides[get_user_cache] to use other backend
+user_cache: CacheBackend = LRUCache(maxsize=user_cache_size, ttl=user_cache_ttl)
+
+def get_user_cache() -> CacheBackend:
+    return user_cache
+
+UserCache = Annotated[CacheBackend, Depends(get_user_cache)]
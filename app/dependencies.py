@@ -1,7 +1,12 @@
+import os
 from typing import Annotated
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends, HTTPException, Cookie
-from sqlmodel import SQLModel, create_engine, Session
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel import SQLModel, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from db_engine import create_db_engine
 
 
 # db config (will be split to config file)
@@ -11,24 +16,100 @@ port: int = 5432
 username: str = "postgres"
 password: str = "password"
 db_name: str = "postgres"
-db_url = f"{db_type}://{username}:{password}@{host}:{port}/{db_name}"
+
+# DB_ASYNC=1 uses async engine / AsyncSession (asyncpg, or aiosqlite with DB_URL=sqlite+aiosqlite://...)
+# default keeps the blocking engine / Session path
+db_async: bool = os.getenv("DB_ASYNC", "0") == "1"
+db_driver: str = "+asyncpg" if db_async else ""
+db_url: str = os.getenv("DB_URL", f"{db_type}{db_driver}://{username}:{password}@{host}:{port}/{db_name}")
 
 
 # inform db tables model
 from .models.users import Users
 
 # create db engine
-engine = create_engine(url=db_url, echo=True)
+engine = create_db_engine(name="app", url=db_url, is_async=db_async)
 
 # set db startup
 @asynccontextmanager
 async def startup_db(app: FastAPI):
-    SQLModel.metadata.create_all(engine)
+    if db_async:
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+    else:
+        SQLModel.metadata.create_all(engine)
     yield
 
+    if db_async:
+        await engine.dispose()
+
+
+class ThreadedSession:
+    """
+    Wrap blocking Session so that routers can 'await' it like AsyncSession.
+    Each DB call runs in the threadpool instead of blocking the event loop.
+    """
+    def __init__(self, session: Session):
+        self.session = session
+
+    def add(self, instance):
+        self.session.add(instance)
+
+    def add_all(self, instances):
+        self.session.add_all(instances)
+
+    async def exec(self, statement, **kwargs):
+        return await run_in_threadpool(self.session.exec, statement, **kwargs)
+
+    async def execute(self, statement, *args, **kwargs):
+        return await run_in_threadpool(self.session.execute, statement, *args, **kwargs)
+
+    async def commit(self):
+        await run_in_threadpool(self.session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.session.rollback)
+
+    async def refresh(self, instance):
+        await run_in_threadpool(self.session.refresh, instance)
+
+    async def stream_partitions(self, statement, size: int):
+        result = await run_in_threadpool(self.session.exec, statement.execution_options(yield_per=size))
+        partitions = result.partitions(size)
+        while (rows := await run_in_threadpool(next, partitions, None)) is not None:
+            yield rows
+
+
+async def stream_partitions(session: AsyncSession | ThreadedSession, statement, size: int):
+    """
+    Fetch rows in batches of 'size' through a server-side cursor.
+
+    :param session: DB Session
+    :param statement: select statement
+    :param size: number of rows per batch
+    :return: async iterator of row lists
+    """
+    if isinstance(session, ThreadedSession):
+        async for rows in session.stream_partitions(statement, size):
+            yield rows
+        return
+
+    result = await session.stream_scalars(statement.execution_options(yield_per=size))
+    async for rows in result.partitions(size):
+        yield rows
+
+
+@asynccontextmanager
+async def open_session():
+    if db_async:
+        async with AsyncSession(engine) as session:
+            yield session
+    else:
+        with Session(engine) as session:
+            yield ThreadedSession(session)
 
-def get_session():
-    with Session(engine) as session:
+async def get_session():
+    async with open_session() as session:
         yield session
 
-DBSession = Annotated[Session, Depends(get_session)]
+DBSession = Annotated[AsyncSession | ThreadedSession, Depends(get_session)]
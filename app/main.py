@@ -1,5 +1,7 @@
 from fastapi import FastAPI
 
+from db_engine import router as db_pool_router
+from metrics import MetricsMiddleware, router as metrics_router
 from .dependencies import startup_db
 from .routers import users
 
@@ -7,6 +9,9 @@ from .routers import users
 # start fastapi instance
 app = FastAPI(lifespan=startup_db)
 app.include_router(router=users.router)
+app.include_router(router=db_pool_router)
+app.include_router(router=metrics_router)
+app.add_middleware(MetricsMiddleware)
 
 
 
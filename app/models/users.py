@@ -27,3 +27,14 @@ class UserPublicModel(UserCreateModel):
     l_name: str
     last_access_dt: datetime
     registered_dt: datetime
+
+
+class BulkConflictModel(SQLModel):
+    index: int
+    username: str | None = None
+    detail: str
+
+
+class BulkRegisterResultModel(SQLModel):
+    inserted: int
+    conflicts: list[BulkConflictModel] = []
@@ -1,34 +1,106 @@
+import json
 from typing_extensions import Annotated, Doc
-from fastapi import APIRouter, HTTPException, status
-from sqlmodel import select
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select, insert
 from uuid import UUID
 
-from ..dependencies import DBSession
-from ..models.users import UserPublicModel, UserCreateModel, Users, uuid4
+from fast_json import FastJSONRoute
+
+from ..cache import CacheBackend, CacheStats, UserCache
+from ..dependencies import DBSession, open_session, stream_partitions
+from ..models.users import (UserPublicModel,
+                            UserCreateModel,
+                            Users,
+                            BulkConflictModel,
+                            BulkRegisterResultModel,
+                            uuid4)
 
 router = APIRouter(prefix="/users",
-                   tags=["users"])
+                   tags=["users"],
+                   route_class=FastJSONRoute)
+
+
+STREAM_BATCH_SIZE: int = 1000
+
+
+async def stream_users(after: UUID | None):
+    # dependency session is closed before the body is sent, so open a new one here
+    statement = select(Users).order_by(Users.uuid)
+    if after is not None:
+        statement = statement.where(Users.uuid > after)
+
+    async with open_session() as session:
+        async for users in stream_partitions(session, statement, STREAM_BATCH_SIZE):
+            yield "".join(f"{UserPublicModel.model_validate(user).model_dump_json()}\n" for user in users)
 
 
 @router.get(path="/",
             response_model=list[UserPublicModel],
-            summary="get all user information")
-async def get_all_users(session: DBSession):
+            summary="get all user information",
+            responses={"200": {"content": {"application/x-ndjson": {}}}})
+async def get_all_users(session: DBSession,
+                        response: Response,
+                        after: Annotated[UUID | None,
+                                         Doc("Return users after this uuid (value of 'X-Next-Cursor' header)")] = None,
+                        limit: Annotated[int, Query(ge=1, le=1000)] = 100,
+                        stream: Annotated[bool,
+                                          Doc("Stream every user after the cursor as NDJSON")] = False):
     """
-    This is a Test
+    Get users ordered by uuid with keyset pagination.
 
     :param session: DB Session
+    :param response: Response to set 'X-Next-Cursor' header
+    :param after: last uuid of the previous page
+    :param limit: max number of users in one page
+    :param stream: if True, stream users as NDJSON instead of one page
     :return: list[UserPublicModel]
     """
-    return session.exec(select(Users)).all()
+    if stream:
+        return StreamingResponse(content=stream_users(after=after),
+                                 media_type="application/x-ndjson")
+
+    statement = select(Users).order_by(Users.uuid).limit(limit)
+    if after is not None:
+        statement = statement.where(Users.uuid > after)
+
+    users = (await session.exec(statement)).all()
+    if len(users) == limit:
+        response.headers["X-Next-Cursor"] = str(users[-1].uuid)
+    return users
 
 @router.get(path="/{uuid}",
             response_model=UserPublicModel,
             summary="get user with uuid")
 async def get_user_with_uuid(uuid: Annotated[UUID,
                                              Doc("Input user's unique UUID")],
-                             session: DBSession):
-    return session.exec(select(Users).where(Users.uuid == uuid)).one_or_none()
+                             session: DBSession,
+                             cache: UserCache):
+    cached = await cache.get(str(uuid))
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+
+    user = (await session.exec(select(Users).where(Users.uuid == uuid))).one_or_none()
+    if user is None:
+        return None
+
+    content = UserPublicModel.model_validate(user).model_dump_json().encode()
+    await cache.set(str(uuid), content)
+    return Response(content=content, media_type="application/json")
+
+@router.get(path="/cache/stats",
+            response_model=CacheStats,
+            summary="get hit / miss / eviction counters of user cache")
+async def get_user_cache_stats(cache: UserCache):
+    return cache.stats.model_copy(update={"size": getattr(cache, "size", None)})
+
+
+async def invalidate_users(cache: CacheBackend, uuids):
+    # call after every commit which creates, updates or deletes users
+    for uuid in uuids:
+        await cache.delete(str(uuid))
 
 @router.post(path="/",
              summary="register new user",
@@ -36,10 +108,11 @@ async def get_user_with_uuid(uuid: Annotated[UUID,
              responses={"400": {"details": "Username is already exist"}})
 async def register_new_user(user_info: Annotated[UserCreateModel,
                                                  Doc("username, first_name, last_name, birthdate")],
-                            session: DBSession):
+                            session: DBSession,
+                            cache: UserCache):
 
     user = Users.model_validate(user_info)
-    exist_user = session.exec(select(Users).where(Users.username == user.username)).one_or_none()
+    exist_user = (await session.exec(select(Users).where(Users.username == user.username))).one_or_none()
 
     if exist_user is not None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
@@ -47,6 +120,96 @@ async def register_new_user(user_info: Annotated[UserCreateModel,
     user.uuid = uuid4()
 
     session.add(user)
-    session.commit()
-    session.refresh(user)
+    await session.commit()
+    await session.refresh(user)
+    await invalidate_users(cache=cache, uuids=[user.uuid])
     return UserPublicModel(**user.model_dump())
+
+
+BULK_MAX_ROWS: int = 10000
+
+
+def parse_bulk_body(body: bytes, content_type: str) -> list:
+    try:
+        if content_type.startswith("application/x-ndjson"):
+            return [json.loads(line) for line in body.splitlines() if line.strip()]
+        rows = json.loads(body)
+
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Body must be a JSON array or NDJSON")
+
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Body must be a JSON array or NDJSON")
+    return rows
+
+@router.post(path="/bulk",
+             summary="register many users in one transaction",
+             response_model=BulkRegisterResultModel,
+             responses={"400": {"details": "Body is not a JSON array or NDJSON"},
+                        "409": {"details": "Username was registered concurrently"},
+                        "413": {"details": "Too many users in one request"}},
+             openapi_extra={"requestBody": {
+                 "required": True,
+                 "content": {
+                     "application/json": {"schema": {"type": "array",
+                                                     "items": {"$ref": "#/components/schemas/UserCreateModel"}}},
+                     "application/x-ndjson": {"schema": {"$ref": "#/components/schemas/UserCreateModel"}}
+                 }
+             }})
+async def register_bulk_users(request: Request, session: DBSession, cache: UserCache):
+    """
+    Register users from JSON array or NDJSON body.
+    Duplicated usernames are checked with one query and rows are inserted with one executemany.
+
+    :param request: Request with JSON array or NDJSON body
+    :param session: DB Session
+    :param cache: user cache to invalidate
+    :return: BulkRegisterResultModel
+    """
+    rows = parse_bulk_body(body=await request.body(),
+                           content_type=request.headers.get("content-type", ""))
+    if len(rows) > BULK_MAX_ROWS:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"Maximum {BULK_MAX_ROWS} users in one request")
+
+    conflicts: list[BulkConflictModel] = []
+    users: dict[str, tuple[int, Users]] = {}
+
+    for index, row in enumerate(rows):
+        try:
+            user = Users.model_validate(UserCreateModel.model_validate(row))
+        except ValidationError as e:
+            conflicts.append(BulkConflictModel(index=index,
+                                               username=row.get("username") if isinstance(row, dict) else None,
+                                               detail="; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}"
+                                                                 for err in e.errors())))
+            continue
+
+        if user.username in users:
+            conflicts.append(BulkConflictModel(index=index, username=user.username, detail="Duplicated in request"))
+            continue
+
+        user.uuid = uuid4()
+        users[user.username] = (index, user)
+
+    # one set-based query for every requested username
+    if users:
+        exist_usernames = (await session.exec(select(Users.username).where(Users.username.in_(users.keys())))).all()
+        for username in exist_usernames:
+            index, _ = users.pop(username)
+            conflicts.append(BulkConflictModel(index=index, username=username, detail="Username is already exist"))
+
+    if users:
+        try:
+            await session.exec(insert(Users), params=[user.model_dump() for _, user in users.values()])
+            await session.commit()
+        except IntegrityError:
+            await session.rollback()
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                                detail="Username was registered concurrently. Retry the request.")
+        await invalidate_users(cache=cache, uuids=[user.uuid for _, user in users.values()])
+
+    conflicts.sort(key=lambda c: c.index)
+    return BulkRegisterResultModel(inserted=len(users), conflicts=conflicts)
@@ -1,4 +1,6 @@
+import os
 import uuid
+from functools import partial
 from typing import Optional
 from datetime import datetime, timedelta, timezone
 #from jose import jwt, JWTError
@@ -6,9 +8,19 @@ import jwt
 from jwt import PyJWTError
 from typing import Annotated
 from fastapi import FastAPI, Depends, HTTPException, status, Response, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import make_url
+from sqlalchemy.pool import StaticPool
 from fastapi.security import HTTPBasic, HTTPBasicCredentials, OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel, EmailStr
 
+from db_engine import create_db_engine
+from response_cache import CachedRoute, cached_response
+from revocation import RevocationList
+from session_store import SessionStore, InMemorySessionStore, SQLSessionStore
+from password_hasher import check_password, router as password_hasher_router
+from user_repository import UserRepository, InMemoryUserRepository, SQLUserRepository
+
 
 dummy_data = {
     1: {"username": "testuser1", "password": "abc123", "first_name": "Alex", "last_name": "Cabassar", "email": "testuser1@company.com", "department": "HR", "is_login": False},
@@ -27,6 +39,25 @@ def yield_dummy_data():
             HTTPException(status_code=500,
                           detail="Yield Users has some problem.")
 
+# user repository indexed by username / email
+# USER_REPOSITORY=sql stores users in USER_DB_URL (seeded with dummy_data) instead of memory
+# repository calls may query the DB, so handlers run them in the threadpool
+if os.getenv("USER_REPOSITORY", "memory") == "sql":
+    user_db_url: str = os.getenv("USER_DB_URL", "sqlite:///./auth_test.db")
+    user_repository: UserRepository = SQLUserRepository(
+        engine=create_db_engine(name="auth_test",
+                                url=user_db_url,
+                                connect_args={"check_same_thread": False} if user_db_url.startswith("sqlite") else {}))
+    for dummy_user in dummy_data.values():
+        if user_repository.get_by_username(dummy_user["username"]) is None:
+            user_repository.add(dummy_user)
+else:
+    user_repository: UserRepository = InMemoryUserRepository(users=dummy_data.values())
+
+async def save_password_hash(username: str, new_hash: str):
+    # plain text or outdated hash is replaced on successful login
+    await run_in_threadpool(user_repository.set_password, username=username, password=new_hash)
+
 class UserQ:
     def __init__(self,
                  first_name: str | None = None,
@@ -65,6 +96,9 @@ class UserRegisterRequestForm(UserPasswordInRequest, UserBasicResponseForm):
 
 
 app = FastAPI()
+# endpoints with @cached_response are served from rendered bytes
+app.router.route_class = CachedRoute
+app.include_router(router=password_hasher_router)
 http_scheme = HTTPBasic(scheme_name="HTTP Basic Authorization Test")
 
 @app.get(path="/",
@@ -72,6 +106,7 @@ http_scheme = HTTPBasic(scheme_name="HTTP Basic Authorization Test")
          summary="Main Path for Test.",
          response_model=BasicResponse,
          response_model_exclude_none=True)
+@cached_response(max_age=60)
 async def main():
     return BasicResponse(msg="You can use this API.")
 
@@ -89,11 +124,17 @@ async def get_users(q: Annotated[dict | None, Depends(UserQ)]):
             value = v
 
     if key is None or value is None:
+        users = await run_in_threadpool(user_repository.all)
         return BasicResponse(msg="success to get users",
-                             count=len(dummy_data),
-                             data=[UserBasicResponseForm(**user) for user in yield_dummy_data()])
-
-    result = [ UserBasicResponseForm(**user) for user in yield_dummy_data() if user.get(key).lower() == value.lower() ]
+                             count=len(users),
+                             data=[UserBasicResponseForm(**user) for user in users])
+
+    if key == "email":
+        user = await run_in_threadpool(user_repository.get_by_email, value)
+        result = [ UserBasicResponseForm(**user) ] if user is not None else []
+    else:
+        users = await run_in_threadpool(user_repository.all)
+        result = [ UserBasicResponseForm(**user) for user in users if user.get(key).lower() == value.lower() ]
     return BasicResponse(msg="Get User' Information",
                          count=len(result),
                          data=result)
@@ -144,16 +185,18 @@ async def user_logout(user: Annotated[UserUsername, Body(embed=True)]):
           response_model=BasicResponse,
           response_model_exclude_unset=True)
 async def user_login(user: HTTPBasicCredentials = Depends(http_scheme)):
-    for u in yield_dummy_data():
-        if user.username == u.get("username") and user.password == u.get("password") and not u.get("is_login"):
-            u.update({"is_login": True})
-            return BasicResponse(msg="Success to login",
-                                 count=1,
-                                 data=[UserBasicResponseForm(**u)])
-
-        if user.username == u.get("username") and u.get("is_login"):
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                                detail="Already logged in.")
+    u = await run_in_threadpool(user_repository.get_by_username, user.username)
+    if u is not None and not u.get("is_login") and await check_password(password=user.password,
+                                                                        hashed=u.get("password"),
+                                                                        save_hash=partial(save_password_hash, u.get("username"))):
+        await run_in_threadpool(user_repository.set_login, username=user.username, is_login=True)
+        return BasicResponse(msg="Success to login",
+                             count=1,
+                             data=[UserBasicResponseForm(**u)])
+
+    if u is not None and u.get("is_login"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Already logged in.")
 
     raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                         detail="Mismatch username and password.")
@@ -166,16 +209,16 @@ async def user_login(user: HTTPBasicCredentials = Depends(http_scheme)):
           response_model_exclude_unset=True,
           deprecated=True)
 async def user_logout(username: str):
-    for u in yield_dummy_data():
-        if username == u.get("username") and u.get("is_login"):
-            u.update({"is_login": False})
-            return BasicResponse(msg="Success to logout",
-                                 count=1,
-                                 data=[UserBasicResponseForm(**u)])
-
-        if username == u.get("username") and not u.get("is_login"):
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                                detail="Already logged out.")
+    u = await run_in_threadpool(user_repository.get_by_username, username)
+    if u is not None and u.get("is_login"):
+        await run_in_threadpool(user_repository.set_login, username=username, is_login=False)
+        return BasicResponse(msg="Success to logout",
+                             count=1,
+                             data=[UserBasicResponseForm(**u)])
+
+    if u is not None and not u.get("is_login"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Already logged out.")
 
     raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                         detail=f"There is no logged in user '{username}'")
@@ -212,7 +255,24 @@ async def get_current_token(token: Annotated[str, Depends(oauth2_scheme)]):
 """
 
 ### Session Test
-session_storage: dict = {}
+# SESSION_STORE=sql shares sessions between worker processes through SESSION_DB_URL
+SESSION_TTL: timedelta = timedelta(minutes=1)
+
+if os.getenv("SESSION_STORE", "memory") == "sql":
+    session_db_url: str = os.getenv("SESSION_DB_URL", "sqlite:///./sessions.db")
+    session_store: SessionStore = SQLSessionStore(
+        engine=create_db_engine(name="session_store",
+                                url=session_db_url,
+                                connect_args={"check_same_thread": False} if session_db_url.startswith("sqlite") else {}))
+else:
+    session_store: SessionStore = InMemorySessionStore()
+
+async def call_session_store(method, *args, **kwargs):
+    # SQL store queries the DB, so it runs in the threadpool.
+    # in-memory store has no lock and is O(1), so it runs on the event loop only
+    if session_store.blocking:
+        return await run_in_threadpool(method, *args, **kwargs)
+    return method(*args, **kwargs)
 
 @app.post(path="/oauth/login",
           tags=["OAuth Session"],
@@ -220,25 +280,28 @@ session_storage: dict = {}
           response_model_exclude_unset=True,
           summary="OAuth Login Test")
 async def oauth_login(response: Response, req: Request, form_data: OAuth2PasswordRequestForm = Depends()):
-    if req.cookies.get("session_id") is not None:
+    session_id: str | None = req.cookies.get("session_id")
+    if session_id is not None and await call_session_store(session_store.get, session_id) is not None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail="Already Logged In.")
 
-    tmp: dict | None = None
-    for user in yield_dummy_data():
-        if form_data.username == user.get("username") and form_data.password == user.get("password"):
-            if form_data.username not in session_storage.values():
-                tmp = user
-                break
-
-    if tmp is None:
+    user = await run_in_threadpool(user_repository.get_by_username, form_data.username)
+    if user is None or not await check_password(password=form_data.password,
+                                                hashed=user.get("password"),
+                                                save_hash=partial(save_password_hash, user.get("username"))):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                             detail="Mismatch username and password")
 
+    # one active session per user
+    if await call_session_store(session_store.has_user, form_data.username):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Already Logged In.")
+
     # store session information in db or in-memory
-    session_id: str = str(uuid.uuid4())
-    expire_datetime: datetime = datetime.now(timezone.utc) + timedelta(minutes=1)
-    session_storage.update({session_id: {"username": tmp.get("username"), "expire_datetime": expire_datetime}})
+    expire_datetime: datetime = datetime.now(timezone.utc) + SESSION_TTL
+    session_id = await call_session_store(session_store.create,
+                                          username=user.get("username"),
+                                          ttl=SESSION_TTL.total_seconds())
 
     # send cookie to client browser
     response.set_cookie(key="session_id", value=session_id, expires=expire_datetime)
@@ -254,10 +317,9 @@ async def oauth_logout(res: Response, req: Request):
     session_id = req.cookies.get("session_id") or None
 
     # if browser has a session_id in the browser' cookie
-    if session_id is not None:# and session_storage.get(session_id).get("expire_datetime") > datetime.now():
-        # remove session_id from session_storage
-        if session_storage.get(session_id):
-            del session_storage[session_id]
+    if session_id is not None:
+        # remove session_id from session_store
+        await call_session_store(session_store.delete, session_id)
         # remove session_id from cookie
         res.delete_cookie(key="session_id")
 
@@ -277,6 +339,14 @@ ALGORITHM: str = "HS256"
 # ES: ECDSA Asymmetric Algorithm (Ecliptic. more lighter than RS)
 # None: Not Recommended.
 
+# revoked 'jti' list shared by workers through REVOCATION_DB_URL (e.g. sqlite:///./revocation.db)
+# default: in-memory sqlite for this process only. StaticPool shares its one connection among threads.
+revocation_db_url: str = os.getenv("REVOCATION_DB_URL", "sqlite://")
+revocation_options: dict = {"connect_args": {"check_same_thread": False}} if revocation_db_url.startswith("sqlite") else {}
+if make_url(revocation_db_url).database in (None, "", ":memory:"):
+    revocation_options["poolclass"] = StaticPool
+revocation_list = RevocationList(engine=create_db_engine(name="revocation", url=revocation_db_url, **revocation_options))
+
 class JWTToken(BaseModel):
     access_token: str
     token_type: str = "bearer"
@@ -292,12 +362,14 @@ def create_jwt_token(username: str):
     # - sub: subject, who will get this token
     # - aud: receiver' domain or ip
     # - exp: expiration(datetime)
+    # - jti: unique token id, used to revoke this token
     # Private Claims: customized claims.
     claim_data: dict = {
         "iss": "luna-negra",
         "sub": username,
         "aud": "http://127.0.0.1:8000",    # this claim requires audience argument in jwt.decode.
-        "exp": datetime.now() + timedelta(minutes=15)
+        "exp": datetime.now() + timedelta(minutes=15),
+        "jti": uuid.uuid4().hex
     }
 
     # create jwt token with encode method. * claims: dict form data.
@@ -313,12 +385,14 @@ oauth2_scheme = OAuth2PasswordBearer(scheme_name="OAuth2 Test", tokenUrl="oauth/
           response_model=JWTToken,
           summary="JWT Login Test")
 async def oauth_jwt_login(res: Response, account: OAuth2PasswordRequestForm = Depends()):
-    for user in yield_dummy_data():
-        if account.username == user.get("username") and account.password == user.get("password"):
-            # get token by transmitting necessary data
-            token = create_jwt_token(username=account.username)
-            res.set_cookie(key="jwt", value=token, httponly=True)
-            return {"result": "ok", "msg": "success to create token", "access_token": token}
+    user = await run_in_threadpool(user_repository.get_by_username, account.username)
+    if user is not None and await check_password(password=account.password,
+                                                 hashed=user.get("password"),
+                                                 save_hash=partial(save_password_hash, user.get("username"))):
+        # get token by transmitting necessary data
+        token = create_jwt_token(username=account.username)
+        res.set_cookie(key="jwt", value=token, httponly=True)
+        return {"result": "ok", "msg": "success to create token", "access_token": token}
 
     raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                         detail="Mismatch username and password.")
@@ -339,15 +413,23 @@ async def get_user(req: Request):
         if payload.get("sub") is None or payload.get("iss") != "luna-negra":
             raise PyJWTError
 
+        # revoked by logout. the Bloom filter check is in memory, only sync / prune and its hits query the DB
+        jti: str | None = payload.get("jti")
+        if jti is not None:
+            if revocation_list.maintenance_due():
+                await run_in_threadpool(revocation_list.maintain)
+            if revocation_list.might_be_revoked(jti) and await run_in_threadpool(revocation_list.confirm, jti):
+                raise PyJWTError
+
     except PyJWTError as e:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                             detail="Could not validate credentials",
                             headers={"WWW-Authenticate": "Bearer"})
 
     # check the aud in token is really exist.
-    for user in yield_dummy_data():
-        if user.get("username") == payload.get("sub"):
-            return UserInDB(username=payload.get("sub"))
+    if await run_in_threadpool(user_repository.get_by_username, payload.get("sub")) is not None:
+        req.state.jwt_payload = payload
+        return UserInDB(username=payload.get("sub"))
 
     raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                         detail="Could not validate credentials",
@@ -369,6 +451,11 @@ async def oauth_jwt_logout(req: Request, res: Response, current_user: UserInDB =
     token: str | None = req.cookies.get("jwt") or None
 
     if token is not None:
+        # token is valid until 'exp' without revocation
+        payload: dict = req.state.jwt_payload
+        if payload.get("jti") is not None:
+            await run_in_threadpool(revocation_list.revoke, jti=payload.get("jti"), expire_at=payload.get("exp"))
+
         res.delete_cookie(key="jwt", httponly=True)
         return {"result": "ok", "msg": "Success to logout"}
 
@@ -0,0 +1,94 @@
+"""
+Throughput of app/ user endpoints with the blocking Session (DB_ASYNC=0) and AsyncSession (DB_ASYNC=1) on SQLite.
+
+    python bench/app_db_session.py --users 10000 --requests 2000 --concurrency 50
+
+Each mode runs in its own process (the engine is created on import of app.dependencies) against the same
+seeded SQLite file, with the user cache disabled so every request reaches the DB.
+Requests are sent in-process through httpx.ASGITransport, so the numbers are for one worker without network.
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import subprocess
+from datetime import date
+from uuid import uuid4
+
+ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def seed(path: str, users: int):
+    from sqlmodel import SQLModel, Session, create_engine, insert
+    from app.models.users import Users
+
+    engine = create_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.exec(insert(Users), params=[{"uuid": uuid4(),
+                                             "username": f"user{i}",
+                                             "f_name": "first",
+                                             "l_name": "last",
+                                             "birthdate": date(2000, 1, 1),
+                                             "password": "password"} for i in range(users)])
+        session.commit()
+
+
+async def run(requests: int, concurrency: int, uuids: list[str]) -> dict[str, float]:
+    import httpx
+    from app.main import app
+    from app.dependencies import startup_db
+
+    async def worker(client: httpx.AsyncClient, path: str, count: int):
+        for i in range(count):
+            response = await client.get(path.format(uuid=uuids[i % len(uuids)]))
+            response.raise_for_status()
+
+    result: dict[str, float] = {}
+    async with startup_db(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name, path in (("get_user_with_uuid", "/users/{uuid}"), ("get_all_users", "/users/?limit=100")):
+                start = time.perf_counter()
+                await asyncio.gather(*(worker(client, path, requests // concurrency) for _ in range(concurrency)))
+                result[name] = requests // concurrency * concurrency / (time.perf_counter() - start)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--db", default="/tmp/bench_app_db_session.db")
+    parser.add_argument("--mode", choices=["sync", "async"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode is not None:
+        from sqlmodel import create_engine, select
+        from app.models.users import Users
+        with create_engine(f"sqlite:///{args.db}").connect() as conn:
+            uuids = [str(uuid) for uuid in conn.execute(select(Users.uuid).limit(1000)).scalars()]
+        for name, rps in asyncio.run(run(args.requests, args.concurrency, uuids)).items():
+            print(f"{args.mode:>5}  {name:<20} {rps:10.1f} req/s")
+        return
+
+    if os.path.exists(args.db):
+        os.remove(args.db)
+    seed(args.db, args.users)
+
+    for mode in ("sync", "async"):
+        env = dict(os.environ,
+                   DB_ASYNC="1" if mode == "async" else "0",
+                   DB_URL=f"sqlite{'+aiosqlite' if mode == 'async' else ''}:///{args.db}",
+                   DB_ECHO="0",
+                   USER_CACHE_SIZE="0")
+        subprocess.run([sys.executable, __file__, "--mode", mode,
+                        "--requests", str(args.requests), "--concurrency", str(args.concurrency), "--db", args.db],
+                       env=env, check=True)
+
+
+if __name__ == "__main__":
+    main()
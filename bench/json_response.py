@@ -0,0 +1,88 @@
+"""
+Latency of a response_model=list[UserPublicModel] endpoint with the stock APIRoute versus fast_json.FastJSONRoute.
+
+    python bench/json_response.py --sizes 100 1000 10000 --repeat 20
+
+The same endpoint is mounted on two apps, one per route class, and returns either UserPublicModel instances
+(FastJSONRoute skips validating them again) or dicts (validated by both). Requests go in-process through
+httpx.ASGITransport, so the time is routing + validation + serialization + response, without network.
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+from datetime import date, datetime
+from uuid import uuid4
+
+import httpx
+from fastapi import APIRouter, FastAPI
+from fastapi.routing import APIRoute
+
+ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.models.users import UserPublicModel
+from fast_json import FAST_JSON_SUPPORTED, FastJSONRoute
+
+
+def make_app(route_class: type[APIRoute], users: list[dict]) -> FastAPI:
+    models = [UserPublicModel(**user) for user in users]
+    router = APIRouter(route_class=route_class)
+
+    @router.get("/models", response_model=list[UserPublicModel])
+    async def get_models():
+        return models
+
+    @router.get("/dicts", response_model=list[UserPublicModel])
+    async def get_dicts():
+        return users
+
+    app = FastAPI()
+    app.include_router(router)
+    return app
+
+
+async def measure(app: FastAPI, path: str, repeat: int) -> float:
+    """median latency (ms)"""
+    samples: list[float] = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = await client.get(path)
+            response.raise_for_status()
+            samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+async def run(sizes: list[int], repeat: int):
+    print(f"{'users':>7}  {'returns':<7}  {'APIRoute':>10}  {'FastJSONRoute':>13}  {'speedup':>7}")
+    for size in sizes:
+        users = [{"uuid": uuid4(),
+                  "username": f"user{i}",
+                  "f_name": "first",
+                  "l_name": "last",
+                  "birthdate": date(2000, 1, 1),
+                  "password": "password",
+                  "last_access_dt": datetime(2024, 1, 1),
+                  "registered_dt": datetime(2024, 1, 1)} for i in range(size)]
+        stock, fast = make_app(APIRoute, users), make_app(FastJSONRoute, users)
+        for path in ("/models", "/dicts"):
+            stock_ms, fast_ms = await measure(stock, path, repeat), await measure(fast, path, repeat)
+            print(f"{size:>7}  {path[1:]:<7}  {stock_ms:>7.2f} ms  {fast_ms:>10.2f} ms  {stock_ms / fast_ms:>6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if not FAST_JSON_SUPPORTED:
+        print("FastJSONRoute falls back to APIRoute with this FastAPI version, both columns are the stock path")
+    asyncio.run(run(args.sizes, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
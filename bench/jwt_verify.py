@@ -0,0 +1,71 @@
+"""
+Verifications per second of oidc.py access tokens: jwt.decode on every request versus VerifiedTokenCache.
+
+    python bench/jwt_verify.py --algorithm ES256 --tokens 1000 --seconds 2
+
+- verify_token: signature check and claim validation on every call (no cache)
+- cache hit:    decode_access_token on tokens already verified once (sha256 digest + LRU lookup)
+- cache miss:   decode_access_token on tokens seen for the first time (verify + store)
+Keys are generated in a temp JWT_KEY_DIR, so the key directory of the app is not touched.
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def rate(function, tokens: list[str], seconds: float) -> float:
+    """calls per second of function over tokens (cycled) for about 'seconds'"""
+    calls = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for token in tokens:
+            assert function(token) is not None
+        calls += len(tokens)
+    return calls / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--algorithm", choices=["RS256", "ES256", "EdDSA"], default="ES256")
+    parser.add_argument("--tokens", type=int, default=1000, help="distinct tokens (at most TOKEN_CACHE_SIZE for hits)")
+    parser.add_argument("--seconds", type=float, default=2)
+    args = parser.parse_args()
+
+    # oidc reads these on import
+    os.environ.update(JWT_ALGORITHM=args.algorithm, JWT_KEY_DIR=tempfile.mkdtemp(prefix="bench_jwt_keys_"))
+    import oidc
+
+    def make_tokens(prefix: str) -> list[str]:
+        exp = int(time.time()) + 3600
+        return [oidc.create_token(payload={"sub": f"{prefix}{i}@test.com", "scope": "openid", "exp": exp})
+                for i in range(args.tokens)]
+
+    tokens = make_tokens("user")
+    uncached = rate(oidc.verify_token, tokens, args.seconds)
+
+    for token in tokens:
+        oidc.decode_access_token(token)
+    hit = rate(oidc.decode_access_token, tokens, args.seconds)
+
+    # every call gets a token the cache has not seen
+    miss_tokens = make_tokens("fresh")
+    start = time.perf_counter()
+    for token in miss_tokens:
+        assert oidc.decode_access_token(token) is not None
+    miss = len(miss_tokens) / (time.perf_counter() - start)
+
+    print(f"{args.algorithm}, {args.tokens} tokens")
+    print(f"{'verify_token (no cache)':<26} {uncached:>12,.0f} /s")
+    print(f"{'cache hit':<26} {hit:>12,.0f} /s   {hit / uncached:.0f}x")
+    print(f"{'cache miss':<26} {miss:>12,.0f} /s")
+    shutil.rmtree(oidc.KEY_DIR)
+
+
+if __name__ == "__main__":
+    main()
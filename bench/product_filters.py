@@ -0,0 +1,67 @@
+"""
+Latency of the product filters of main.py (/items?p_type=) and dependency.py (/products/?public=):
+a scan of every row (before) versus catalog.Catalog hash indexes (after), by catalog size.
+
+    python bench/product_filters.py --sizes 10000 100000 1000000 --types 100 --public-ratio 0.01
+
+Rows look like the products of dependency.py. Each filter is run 'repeat' times and the median is reported.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+
+ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from catalog import Catalog
+
+
+def make_products(count: int, types: int, public_ratio: float) -> list[dict]:
+    rng = random.Random(0)
+    return [{"id": i,
+             "product": f"product{i}",
+             "type": f"type{rng.randrange(types)}",
+             "public": rng.random() < public_ratio} for i in range(count)]
+
+
+def scan(rows: list[dict], field: str, value) -> list[dict]:
+    # the loops of get_items / get_products before the index
+    return [row for row in rows if row.get(field) == value]
+
+
+def measure(function, repeat: int) -> tuple[float, int]:
+    """median latency (ms) and number of rows found"""
+    samples: list[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        found = function()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), len(found)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--types", type=int, default=100)
+    parser.add_argument("--public-ratio", type=float, default=0.01)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'products':>9}  {'filter':<12} {'rows':>7}  {'scan ms':>9}  {'index ms':>9}  {'build s':>7}")
+    for size in args.sizes:
+        rows = make_products(size, args.types, args.public_ratio)
+        start = time.perf_counter()
+        catalog = Catalog(rows=rows, indexes=["id", "type", "public"])
+        build = time.perf_counter() - start
+
+        for field, value in (("type", "type0"), ("public", True)):
+            scanned, found = measure(lambda: scan(rows, field, value), args.repeat)
+            indexed, _ = measure(lambda: catalog.find(**{field: value}), args.repeat)
+            print(f"{size:>9}  {field + '=' + str(value):<12} {found:>7}  {scanned:>9.2f}  {indexed:>9.3f}  {build:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
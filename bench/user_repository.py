@@ -0,0 +1,88 @@
+"""
+Latency of the user lookup done by every login path of auth_test.py, by number of users.
+
+    python bench/user_repository.py --sizes 1000 10000 100000 1000000
+
+Compares the linear scan the endpoints used before (iterating every user for a username) with
+InMemoryUserRepository (hash index) and SQLUserRepository (unique index) on a SQLite file.
+Password hashing is left out: it costs the same for any number of users.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+
+from sqlalchemy import create_engine
+
+ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from user_repository import AuthUser, InMemoryUserRepository, SQLUserRepository
+
+SEED_BATCH_SIZE: int = 50000
+
+
+def make_users(count: int) -> list[dict]:
+    return [{"username": f"user{i}",
+             "password": "password",
+             "first_name": "first",
+             "last_name": "last",
+             "email": f"user{i}@company.com",
+             "department": "Dev",
+             "is_login": False} for i in range(count)]
+
+
+def linear_scan(users: list[dict], username: str) -> dict | None:
+    for user in users:
+        if user.get("username") == username:
+            return user
+    return None
+
+
+def measure(lookup, usernames: list[str]) -> tuple[float, float]:
+    """p50 / p99 latency (us)"""
+    samples: list[float] = []
+    for username in usernames:
+        start = time.perf_counter()
+        assert lookup(username) is not None
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--lookups", type=int, default=1000)
+    parser.add_argument("--scan-lookups", type=int, default=20, help="lookups for the (slow) linear scan")
+    parser.add_argument("--db", default="/tmp/bench_user_repository.db", help="SQLite file (removed first)")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'users':>9}  {'linear scan p50':>16}  {'memory p50/p99':>16}  {'sqlite p50/p99':>16}   (us)")
+    for size in args.sizes:
+        users = make_users(size)
+        usernames = [f"user{rng.randrange(size)}" for _ in range(args.lookups)]
+
+        scan = measure(lambda username: linear_scan(users, username), usernames[:args.scan_lookups])
+        memory = measure(InMemoryUserRepository(users).get_by_username, usernames)
+
+        if os.path.exists(args.db):
+            os.remove(args.db)
+        repository = SQLUserRepository(engine=create_engine(f"sqlite:///{args.db}"))
+        with repository.engine.begin() as conn:
+            for start in range(0, size, SEED_BATCH_SIZE):
+                conn.execute(AuthUser.__table__.insert(), users[start:start + SEED_BATCH_SIZE])
+        sql = measure(repository.get_by_username, usernames)
+        repository.engine.dispose()
+
+        print(f"{size:>9}  {scan[0]:>16.1f}  {memory[0]:>7.2f}/{memory[1]:<8.2f}  {sql[0]:>7.1f}/{sql[1]:<8.1f}")
+
+    if os.path.exists(args.db):
+        os.remove(args.db)
+
+
+if __name__ == "__main__":
+    main()
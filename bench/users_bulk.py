@@ -0,0 +1,74 @@
+"""
+Time to register N users through app/ with N x POST /users/ versus one POST /users/bulk, on SQLite.
+
+    python bench/users_bulk.py --sizes 100 1000 5000 --concurrency 10
+
+Single-user requests are sent 'concurrency' at a time (like a client looping over a file with a few connections),
+the bulk request sends every user as one JSON array. Requests go in-process through httpx.ASGITransport,
+so the numbers are for one worker without network (a real network adds one round trip per request).
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def make_users(prefix: str, count: int) -> list[dict]:
+    return [{"username": f"{prefix}-{i}",
+             "f_name": "first",
+             "l_name": "last",
+             "birthdate": "2000-01-01",
+             "password": "password"} for i in range(count)]
+
+
+async def run(sizes: list[int], concurrency: int):
+    import httpx
+    from app.main import app
+    from app.dependencies import startup_db
+
+    async with startup_db(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            print(f"{'users':>7}  {'N x POST /users/':>18}  {'POST /users/bulk':>18}  {'speedup':>8}")
+            for size in sizes:
+                users = make_users(f"single{size}", size)
+                semaphore = asyncio.Semaphore(concurrency)
+
+                async def register(user: dict):
+                    async with semaphore:
+                        (await client.post("/users/", json=user)).raise_for_status()
+
+                start = time.perf_counter()
+                await asyncio.gather(*(register(user) for user in users))
+                single = time.perf_counter() - start
+
+                start = time.perf_counter()
+                response = await client.post("/users/bulk", json=make_users(f"bulk{size}", size))
+                response.raise_for_status()
+                assert response.json()["inserted"] == size
+                bulk = time.perf_counter() - start
+
+                print(f"{size:>7}  {single * 1000:>15.1f} ms  {bulk * 1000:>15.1f} ms  {single / bulk:>7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000], help="max 10000 (BULK_MAX_ROWS)")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--db", default="/tmp/bench_users_bulk.db", help="SQLite file (removed first)")
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        os.remove(args.db)
+    # app.dependencies reads these on import
+    os.environ.update(DB_URL=f"sqlite:///{args.db}", DB_ASYNC="0", DB_ECHO="0")
+    asyncio.run(run(args.sizes, args.concurrency))
+    os.remove(args.db)
+
+
+if __name__ == "__main__":
+    main()
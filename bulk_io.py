@@ -0,0 +1,168 @@
+import io
+import csv
+import json
+from typing import AsyncIterator, Callable, Iterable, Iterator, Literal
+from fastapi import HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import Engine
+
+
+BulkFormat = Literal["ndjson", "csv"]
+
+MEDIA_TYPES: dict[str, str] = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+# max number of invalid records reported in the import result (all are counted)
+IMPORT_MAX_ERRORS: int = 100
+
+# one record must be in one line. a longer line is rejected (413), so a body without newline is not buffered whole
+MAX_LINE_BYTES: int = 1024 * 1024
+
+
+def get_bulk_format(request: Request) -> BulkFormat:
+    content_type = request.headers.get("content-type", "")
+    for bulk_format, media_type in MEDIA_TYPES.items():
+        if content_type.startswith(media_type):
+            return bulk_format
+
+    raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                        detail="Content-Type must be 'application/x-ndjson' or 'text/csv'")
+
+
+def decode_line(line: bytes) -> str | None:
+    # None: not UTF-8, reported as an invalid record
+    try:
+        return line.decode().rstrip("\r")
+    except UnicodeDecodeError:
+        return None
+
+async def iter_lines(request: Request) -> AsyncIterator[str | None]:
+    # read the body chunk by chunk, so only one line is kept in memory.
+    # only the new chunk is searched for newline, and a line is joined once from its pieces
+    pieces: list[bytes] = []
+    size: int = 0
+    async for chunk in request.stream():
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            piece = chunk[start:] if end == -1 else chunk[start:end]
+            size += len(piece)
+            if size > MAX_LINE_BYTES:
+                raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                                    detail=f"Line is longer than {MAX_LINE_BYTES} bytes")
+            if piece:
+                pieces.append(piece)
+            if end == -1:
+                break
+
+            yield decode_line(b"".join(pieces))
+            pieces, size = [], 0
+            start = end + 1
+
+    if pieces:
+        yield decode_line(b"".join(pieces))
+
+
+async def iter_records(request: Request) -> AsyncIterator[tuple[int, dict | None]]:
+    """
+    Parse NDJSON or CSV (with header line) body incrementally.
+    CSV record must be in one line and empty field is regarded as None.
+
+    :param request: Request with 'application/x-ndjson' or 'text/csv' body
+    :return: async iterator of (line number, record). record is None if the line can not be parsed.
+    """
+    bulk_format = get_bulk_format(request)
+    header: list[str] | None = None
+
+    line_no = 0
+    async for line in iter_lines(request):
+        line_no += 1
+        if line is None:
+            yield line_no, None
+            continue
+        if not line.strip():
+            continue
+
+        if bulk_format == "ndjson":
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield line_no, record if isinstance(record, dict) else None
+            continue
+
+        values = next(csv.reader([line]))
+        if header is None:
+            header = values
+            continue
+        yield line_no, {key: value or None for key, value in zip(header, values)}
+
+
+def render_lines(rows: Iterable[dict], bulk_format: BulkFormat, fields: list[str], with_header: bool = False) -> str:
+    if bulk_format == "ndjson":
+        return "".join(f"{json.dumps(dict(row))}\n" for row in rows)
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, lineterminator="\n")
+    if with_header:
+        writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+async def import_records(request: Request,
+                         model: type[BaseModel],
+                         write_batch: Callable[[list[dict]], int],
+                         batch_size: int) -> dict:
+    """
+    Validate records of the body with 'model' and write them in batches.
+
+    :param request: Request with NDJSON or CSV body
+    :param model: pydantic model of a record
+    :param write_batch: blocking function (run in the threadpool) to write validated records, returns inserted rows.
+                        each batch is committed separately, so memory stays bounded for large body
+    :param batch_size: records per write_batch call
+    :return: counts of received / inserted / skipped (existing) / invalid records, and errors of invalid records
+    """
+    received: int = 0
+    inserted: int = 0
+    invalid: int = 0
+    errors: list[dict] = []
+    batch: list[dict] = []
+
+    async for line_no, record in iter_records(request):
+        received += 1
+        try:
+            batch.append(model.model_validate(record).model_dump())
+        except ValidationError as e:
+            invalid += 1
+            if len(errors) < IMPORT_MAX_ERRORS:
+                errors.append({"line": line_no, "detail": "; ".join(err["msg"] for err in e.errors())})
+            continue
+
+        if len(batch) >= batch_size:
+            inserted += await run_in_threadpool(write_batch, batch)
+            batch = []
+
+    if batch:
+        inserted += await run_in_threadpool(write_batch, batch)
+
+    return {"received": received,
+            "inserted": inserted,
+            "skipped": received - inserted - invalid,
+            "invalid": invalid,
+            "errors": errors}
+
+
+def stream_rows(engine: Engine, statement, bulk_format: BulkFormat, fields: list[str], batch_size: int) -> Iterator[str]:
+    # sync generator: StreamingResponse iterates it in the threadpool, 'batch_size' rows fetched at a time
+    with engine.connect() as conn:
+        result = conn.execution_options(yield_per=batch_size).execute(statement)
+        if bulk_format == "csv":
+            yield render_lines(rows=[], bulk_format=bulk_format, fields=fields, with_header=True)
+
+        for rows in result.mappings().partitions():
+            yield render_lines(rows=rows, bulk_format=bulk_format, fields=fields)
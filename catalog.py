@@ -0,0 +1,48 @@
+from typing import Any, Iterable, Iterator
+
+
+class Catalog:
+    """
+    In-memory rows (dict) with hash indexes on categorical fields.
+    Each index keeps the list of rows for every value, in insertion order, so
+    find() costs the size of the result instead of a scan of every row.
+    """
+    def __init__(self, rows: Iterable[dict] = (), indexes: Iterable[str] = ()):
+        self.rows: list[dict] = []
+        self.indexes: dict[str, dict[Any, list[dict]]] = {field: {} for field in indexes}
+        for row in rows:
+            self.add(row)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self.rows)
+
+    def add(self, row: dict):
+        self.rows.append(row)
+        for field, index in self.indexes.items():
+            index.setdefault(row.get(field), []).append(row)
+
+    def all(self) -> list[dict]:
+        return list(self.rows)
+
+    def find(self, **conditions) -> list[dict]:
+        """
+        Rows whose indexed fields are equal to all conditions, e.g. find(type="pc", public=True).
+        With several conditions, the smallest bucket is filtered by the others.
+        """
+        buckets: list[tuple[str, list[dict]]] = []
+        for field, value in conditions.items():
+            if field not in self.indexes:
+                raise KeyError(f"'{field}' is not indexed")
+            buckets.append((field, self.indexes[field].get(value, [])))
+
+        if not buckets:
+            return self.all()
+
+        smallest_field, smallest = min(buckets, key=lambda bucket: len(bucket[1]))
+        others = [(field, value) for field, value in conditions.items() if field != smallest_field]
+        if not others:
+            return list(smallest)
+        return [row for row in smallest if all(row.get(field) == value for field, value in others)]
@@ -0,0 +1 @@
+# keeps the repository root on sys.path, so tests import top-level modules (e.g. 'import oidc') as the apps do
@@ -0,0 +1,129 @@
+import os
+import time
+from bisect import bisect_left
+from fastapi import APIRouter
+from pydantic import BaseModel
+from sqlalchemy import Engine, create_engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+# pool config from env var
+# - DB_ECHO: '1' logs every SQL statement (off by default)
+# - DB_POOL_SIZE / DB_MAX_OVERFLOW / DB_POOL_TIMEOUT: QueuePool sizing
+# - DB_POOL_PRE_PING: '1' tests every checkout with a round trip (off by default, as in SQLAlchemy).
+#                     enable it when the DB or a proxy / firewall drops idle connections and requests fail after restarts
+# - DB_POOL_RECYCLE: max age (sec) of connections. cheaper than pre-ping when idle connections are dropped after a known time
+db_echo: bool = os.getenv("DB_ECHO", "0") == "1"
+pool_size: int = int(os.getenv("DB_POOL_SIZE", "5"))
+max_overflow: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+pool_timeout: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+pool_pre_ping: bool = os.getenv("DB_POOL_PRE_PING", "0") == "1"
+pool_recycle: int = int(os.getenv("DB_POOL_RECYCLE", "-1"))
+
+# upper bounds (sec) of checkout wait time histogram
+WAIT_BUCKETS: tuple = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, float("inf"))
+
+
+class WaitHistogram:
+    def __init__(self):
+        self.counts: list[int] = [0] * len(WAIT_BUCKETS)
+        self.total: float = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(WAIT_BUCKETS, seconds)] += 1
+        self.total += seconds
+
+
+# engine name -> (engine, histogram)
+engines: dict[str, tuple[Engine, WaitHistogram]] = {}
+
+
+class TimedPoolMixin:
+    """
+    Record how long each checkout waits for a connection.
+    logging_name is kept by pool.recreate(), so it is used as the engine name.
+    """
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            engines[self._orig_logging_name][1].observe(time.perf_counter() - start)
+
+class TimedQueuePool(TimedPoolMixin, QueuePool):
+    pass
+
+class TimedAsyncAdaptedQueuePool(TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def create_db_engine(name: str, url: str, is_async: bool = False, **kwargs) -> Engine | AsyncEngine:
+    """
+    Create sync or async engine with pool settings from env var and register it for pool stats.
+
+    :param name: unique engine name shown in pool stats
+    :param url: database url
+    :param is_async: create AsyncEngine if True
+    :param kwargs: extra arguments for create_engine (e.g. connect_args)
+    :return: Engine | AsyncEngine
+    """
+    options: dict = {"echo": db_echo,
+                     "pool_pre_ping": pool_pre_ping,
+                     "pool_recycle": pool_recycle,
+                     "pool_logging_name": name}
+
+    # in-memory sqlite can not use QueuePool
+    if make_url(url).database not in (None, "", ":memory:"):
+        options.update({"poolclass": TimedAsyncAdaptedQueuePool if is_async else TimedQueuePool,
+                        "pool_size": pool_size,
+                        "max_overflow": max_overflow,
+                        "pool_timeout": pool_timeout})
+    options.update(kwargs)
+
+    engine = create_async_engine(url=url, **options) if is_async else create_engine(url=url, **options)
+    engines[name] = (engine.sync_engine if is_async else engine, WaitHistogram())
+    return engine
+
+
+class PoolStats(BaseModel):
+    pool: str
+    size: int | None = None
+    checked_in: int | None = None
+    checked_out: int | None = None
+    overflow: int | None = None
+    wait_count: int
+    wait_seconds_sum: float
+    wait_buckets: dict[str, int]
+
+
+def get_pool_stats() -> list[PoolStats]:
+    result: list[PoolStats] = []
+    for name, (engine, histogram) in engines.items():
+        pool = engine.pool
+        is_queue = isinstance(pool, QueuePool)
+        # cumulative counts of checkouts waited <= bucket bound
+        cumulative: int = 0
+        buckets: dict[str, int] = {}
+        for bound, count in zip(WAIT_BUCKETS, histogram.counts):
+            cumulative += count
+            buckets["+Inf" if bound == float("inf") else str(bound)] = cumulative
+
+        result.append(PoolStats(pool=name,
+                                size=pool.size() if is_queue else None,
+                                checked_in=pool.checkedin() if is_queue else None,
+                                checked_out=pool.checkedout() if is_queue else None,
+                                overflow=pool.overflow() if is_queue else None,
+                                wait_count=cumulative,
+                                wait_seconds_sum=histogram.total,
+                                wait_buckets=buckets))
+    return result
+
+
+router = APIRouter(tags=["DB Pool"])
+
+@router.get(path="/db/pool",
+            response_model=list[PoolStats],
+            summary="Get connection pool statistics of every engine.")
+async def pool_stats():
+    return get_pool_stats()
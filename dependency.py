@@ -2,6 +2,8 @@ from typing import Annotated, Union
 from fastapi import FastAPI, Depends, Header, HTTPException
 from pydantic import BaseModel
 
+from catalog import Catalog
+
 
 # fake db
 fake_items_db = [{"item_name": "Foo"},
@@ -16,6 +18,7 @@ products_list = [
     {"id": 4, "product": "product4", "type": "pc", "public": False},
     {"id": 5, "product": "product5", "type": "smart phone", "public": False},
 ]
+products = Catalog(rows=products_list, indexes=["id", "type", "public"])
 
 class CommonQ:
     def __init__(self, q: Union[str, None] = None, skip: int = 0, limit: int = 100):
@@ -52,21 +55,14 @@ async def test_dependencies(common_q: CommonQ = Depends(CommonQ)):
 
 @app.get(path="/products/", tags=["Dependency"])
 async def get_products(q: Annotated[str, Depends(range_dependency)]):
-    response = []
-    for p in products_list:
-        if q.get("public") and not p.get("public"):
-            continue
-        response.append(p)
-
+    response = products.find(public=True) if q.get("public") else products.all()
     return {"msg": "ok", "data": response}
 
 @app.delete("/products/{prod_id}", tags=["Dependency"])
 async def delete_public_product(prod_id: int, q: Annotated[str, Depends(id_dependency)]):
     if q.get("public"):
-        data = None
-        for p in products_list:
-            if p.get("id") == prod_id and p.get("public"):
-                data = p
+        found = products.find(id=prod_id, public=True)
+        data = found[-1] if found else None
 
         if data is not None:
             return {
@@ -0,0 +1,228 @@
+import os
+import json
+import mmap
+import threading
+from typing import Iterable
+from starlette.concurrency import run_in_threadpool
+
+from item_store import ItemStore
+
+
+class DurableItemStore(ItemStore):
+    """
+    ItemStore persisted in 'directory' as a snapshot and append-only logs.
+
+    - write: add / update / delete append one JSON line with the whole item (replay is idempotent) to a buffer.
+             commit() writes the buffer and fsyncs once for every write appended so far (group commit),
+             so requests committing at the same time share one fsync.
+    - snapshot: after 'snapshot_every' records, the next log generation is started and items are written to
+                a new snapshot in a background thread (tmp file, fsync, rename). older logs are removed after it.
+    - reload: snapshot and logs are read through mmap. a torn record at the end of a log (crash while writing)
+              is cut off, and a corrupt record before the end raises ValueError.
+              'last_id' is kept in the snapshot and in every put record, so ids are never reused.
+    - failure: when a write or fsync of the log fails, the store is failed and every later commit() raises.
+               what reached the disk is unknown after a failed fsync, so retrying it could lose records silently.
+    """
+    SNAPSHOT: str = "snapshot.json"
+
+    def __init__(self,
+                 directory: str,
+                 snapshot_every: int = 100000,
+                 compact_ratio: float = 0.5,
+                 sorted_indexes: Iterable[str] = ()):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self._log = None
+        self._buffer: list[bytes | int] = []            # int: start log of this generation
+        self._buffer_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._appended: int = 0
+        self._synced: int = 0
+        self._log_records: int = 0
+        self._snapshot_thread: threading.Thread | None = None
+        self._snapshot_generation: int = 0                  # generation of the last written snapshot
+        self._failed: BaseException | None = None           # error of a failed flush
+
+        os.makedirs(directory, exist_ok=True)
+        self.generation, last_id, items = self._load()
+        super().__init__(items, compact_ratio=compact_ratio, sorted_indexes=sorted_indexes)
+        self.last_id = max(self.last_id, last_id)
+        self._log = open(self._log_path(self.generation), "ab")
+
+    def _log_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f"log.{generation:08d}.jsonl")
+
+    def _log_generations(self) -> list[int]:
+        return sorted(int(name.split(".")[1]) for name in os.listdir(self.directory)
+                      if name.startswith("log.") and name.endswith(".jsonl"))
+
+    def _load(self) -> tuple[int, int, list[dict]]:
+        generation, last_id = 0, 0
+        state: dict[int, dict] = {}
+
+        snapshot_path = os.path.join(self.directory, self.SNAPSHOT)
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                header_end = mm.find(b"\n")
+                header = json.loads(mm[:header_end])
+                generation, last_id = header["generation"], header["last_id"]
+                self._snapshot_generation = generation
+                state = {item["id"]: item for item in json.loads(mm[header_end + 1:])}
+
+        for log_generation in self._log_generations():
+            if log_generation < generation:
+                continue
+            generation = log_generation
+            last_id = max(last_id, self._replay(self._log_path(log_generation), state))
+
+        return generation, last_id, list(state.values())
+
+    @staticmethod
+    def _replay(path: str, state: dict[int, dict]) -> int:
+        last_id, position = 0, 0
+        with open(path, "r+b") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return last_id
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                while (end := mm.find(b"\n", position)) != -1:
+                    try:
+                        record = json.loads(mm[position:end])
+                    except ValueError:
+                        if end + 1 < size:
+                            raise ValueError(f"corrupt record in {path} at byte {position}") from None
+                        break       # torn last record
+
+                    if record["op"] == "put":
+                        state[record["item"]["id"]] = record["item"]
+                        last_id = max(last_id, record["last_id"])
+                    elif record["op"] == "del":
+                        state.pop(record["id"], None)
+                    position = end + 1
+
+            # cut off the torn record, so new records are not appended after it
+            if position < size:
+                f.truncate(position)
+        return last_id
+
+    def _append(self, record: dict):
+        if self._log is None:
+            return      # loading
+
+        with self._buffer_lock:
+            self._buffer.append(json.dumps(record).encode() + b"\n")
+            self._appended += 1
+            self._log_records += 1
+            if self._log_records >= self.snapshot_every and self._snapshot_thread is None:
+                self._start_snapshot()
+
+    def _start_snapshot(self):
+        # items up to here are in the snapshot, and records from here go to the next log.
+        # items are replaced (not changed in place) by update(), so the list of them is a consistent view.
+        self.generation += 1
+        self._buffer.append(self.generation)
+        self._log_records = 0
+        self._snapshot_thread = threading.Thread(target=self._write_snapshot,
+                                                 args=(self.generation, self.last_id, list(self)),
+                                                 daemon=True)
+        self._snapshot_thread.start()
+
+    def _write_snapshot(self, generation: int, last_id: int, items: list[dict]):
+        # on failure (e.g. ENOSPC) the older snapshot and every log after it are kept,
+        # and the next snapshot is tried after another 'snapshot_every' records
+        path = os.path.join(self.directory, self.SNAPSHOT)
+        try:
+            with open(path + ".tmp", "wb") as f:
+                f.write(json.dumps({"generation": generation, "last_id": last_id}).encode() + b"\n")
+                f.write(json.dumps(items).encode())
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(path + ".tmp", path)
+
+            directory = os.open(self.directory, os.O_RDONLY)
+            try:
+                os.fsync(directory)
+            finally:
+                os.close(directory)
+
+            self._snapshot_generation = generation
+            self._remove_logs(before=generation)
+        finally:
+            if os.path.exists(path + ".tmp"):
+                os.remove(path + ".tmp")
+            self._snapshot_thread = None
+
+    def _remove_logs(self, before: int):
+        # logs before the snapshot are not needed. called by snapshot and flush threads.
+        for log_generation in self._log_generations():
+            if log_generation < before:
+                try:
+                    os.remove(self._log_path(log_generation))
+                except FileNotFoundError:
+                    pass
+
+    def flush(self):
+        """write and fsync every record appended before this call (blocking)"""
+        target = self._appended
+        with self._flush_lock:
+            if self._failed is not None:
+                raise OSError(f"log of {self.directory} failed, restart to reload the store") from self._failed
+            if self._synced >= target:
+                return      # done by the flush of other caller
+
+            with self._buffer_lock:
+                records, self._buffer = self._buffer, []
+                appended = self._appended
+
+            try:
+                for record in records:
+                    if isinstance(record, int):
+                        self._log.flush()
+                        os.fsync(self._log.fileno())
+                        self._log.close()
+                        self._log = open(self._log_path(record), "ab")
+                        self._remove_logs(before=min(record, self._snapshot_generation))
+                    else:
+                        self._log.write(record)
+                self._log.flush()
+                os.fsync(self._log.fileno())
+            except BaseException as e:
+                self._failed = e
+                raise
+            self._synced = appended
+
+    async def commit(self):
+        await run_in_threadpool(self.flush)
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            if self._snapshot_thread is not None:
+                self._snapshot_thread.join()
+            self._log.close()
+
+    def add(self, item: dict) -> dict:
+        item = super().add(item)
+        self._append({"op": "put", "item": item, "last_id": self.last_id})
+        return item
+
+    def update(self, item_id: int, values: dict) -> dict | None:
+        # replace the item instead of changing it, for the snapshot being written
+        item = self.get(item_id)
+        if item is None:
+            return None
+
+        self._unindex(item)
+        item = {**item, **values, "id": item_id}
+        self._slots[self._positions[item_id]] = item
+        self._index(item)
+        self._append({"op": "put", "item": item, "last_id": self.last_id})
+        return item
+
+    def delete(self, item_id: int) -> dict | None:
+        item = super().delete(item_id)
+        if item is not None:
+            self._append({"op": "del", "id": item_id})
+        return item
@@ -0,0 +1,117 @@
+import inspect
+import warnings
+from typing import Any, Annotated, Callable, get_args, get_origin
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from pydantic import BaseModel, TypeAdapter
+
+# FastJSONRoute builds the request handler with fastapi.routing.get_request_handler (not public API),
+# written against fastapi 0.116 (pinned in requirements.txt). if its parameters change, routes fall back to APIRoute.
+REQUEST_HANDLER_PARAMETERS: set[str] = {"dependant", "body_field", "status_code", "response_class", "response_field",
+                                        "response_model_include", "response_model_exclude", "response_model_by_alias",
+                                        "response_model_exclude_unset", "response_model_exclude_defaults",
+                                        "response_model_exclude_none", "dependency_overrides_provider",
+                                        "embed_body_fields"}
+try:
+    from fastapi.routing import get_request_handler
+    FAST_JSON_SUPPORTED: bool = REQUEST_HANDLER_PARAMETERS <= set(inspect.signature(get_request_handler).parameters)
+except ImportError:
+    FAST_JSON_SUPPORTED: bool = False
+
+if not FAST_JSON_SUPPORTED:
+    warnings.warn("fastapi.routing.get_request_handler is not as expected, FastJSONRoute falls back to APIRoute")
+
+
+class RawJSON(bytes):
+    """JSON document already serialized by pydantic-core"""
+    pass
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse which sends RawJSON content as it is, instead of json.dumps() again.
+    """
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, RawJSON):
+            return content
+        return super().render(content)
+
+
+def get_typed_check(annotation: Any) -> Callable[[Any], bool]:
+    """
+    Return function to check the value is exactly of 'annotation' type already,
+    for a pydantic model and a list of it. Others are always validated.
+    """
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return lambda value: type(value) is annotation
+
+    args = get_args(annotation)
+    if get_origin(annotation) is list and len(args) == 1 and isinstance(args[0], type) and issubclass(args[0], BaseModel):
+        model = args[0]
+        return lambda value: type(value) is list and all(type(v) is model for v in value)
+
+    return lambda value: False
+
+
+class FastResponseField:
+    """
+    Proxy of the response field of a route.
+
+    - validate: return value of the declared type is not validated again.
+    - serialize: dump to JSON bytes in pydantic-core directly
+                 (instead of dump to python objects and json.dumps() in JSONResponse).
+    """
+    def __init__(self, field):
+        self.field = field
+        self.adapter = TypeAdapter(Annotated[field.type_, field.field_info])
+        self.is_typed = get_typed_check(field.type_)
+
+    def __getattr__(self, name: str):
+        return getattr(self.field, name)
+
+    def validate(self, value: Any, values: dict = {}, *, loc: tuple = ()):
+        if self.is_typed(value):
+            return value, None
+        return self.field.validate(value, values, loc=loc)
+
+    def serialize(self, value: Any, *, include=None, exclude=None, by_alias: bool = True,
+                  exclude_unset: bool = False, exclude_defaults: bool = False, exclude_none: bool = False,
+                  **kwargs) -> RawJSON:
+        return RawJSON(self.adapter.dump_json(value,
+                                              include=include,
+                                              exclude=exclude,
+                                              by_alias=by_alias,
+                                              exclude_unset=exclude_unset,
+                                              exclude_defaults=exclude_defaults,
+                                              exclude_none=exclude_none))
+
+
+class FastJSONRoute(APIRoute):
+    """
+    Route class which serializes response_model straight to JSON bytes.
+    Routes without response_model or with their own response_class are handled as usual,
+    and so is every route when FastAPI internals differ from the expected ones (FAST_JSON_SUPPORTED).
+    """
+    def get_route_handler(self) -> Callable:
+        response_class = self.response_class
+        if (not FAST_JSON_SUPPORTED or not hasattr(self, "_embed_body_fields")
+                or self.response_field is None or not isinstance(response_class, DefaultPlaceholder)
+                or response_class.value is not JSONResponse):
+            return super().get_route_handler()
+
+        return get_request_handler(
+            dependant=self.dependant,
+            body_field=self.body_field,
+            status_code=self.status_code,
+            response_class=FastJSONResponse,
+            response_field=FastResponseField(self.secure_cloned_response_field),
+            response_model_include=self.response_model_include,
+            response_model_exclude=self.response_model_exclude,
+            response_model_by_alias=self.response_model_by_alias,
+            response_model_exclude_unset=self.response_model_exclude_unset,
+            response_model_exclude_defaults=self.response_model_exclude_defaults,
+            response_model_exclude_none=self.response_model_exclude_none,
+            dependency_overrides_provider=self.dependency_overrides_provider,
+            embed_body_fields=self._embed_body_fields,
+        )
@@ -0,0 +1,112 @@
+import os
+import stat
+import hashlib
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from fastapi import HTTPException, Request, Response, status
+from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
+
+
+# file serving config from env var
+# - FILE_ROOT: directory served by /file/{file_path}. paths outside of it are never served.
+# - FILE_MAX_AGE: max-age of Cache-Control in seconds
+# - FILE_ETAG_HASH_MAX_SIZE: files up to this size get sha256 ETag of content, larger ones get ETag of stat
+FILE_ROOT: str = os.path.realpath(os.getenv("FILE_ROOT", "./static"))
+FILE_MAX_AGE: int = int(os.getenv("FILE_MAX_AGE", "3600"))
+FILE_ETAG_HASH_MAX_SIZE: int = int(os.getenv("FILE_ETAG_HASH_MAX_SIZE", str(64 * 1024 * 1024)))
+
+
+class ETagCache:
+    """
+    ETag of files keyed by (device, inode, mtime, size), so content is hashed once per version of a file.
+    """
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._etags: OrderedDict[tuple, str] = OrderedDict()
+
+    @staticmethod
+    def compute(path: str, stat_result: os.stat_result) -> str:
+        if stat_result.st_size > FILE_ETAG_HASH_MAX_SIZE:
+            return f'"{stat_result.st_ino:x}-{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            while chunk := f.read(1024 * 1024):
+                digest.update(chunk)
+        return f'"{digest.hexdigest()[:32]}"'
+
+    async def get(self, path: str, stat_result: os.stat_result) -> str:
+        key = (stat_result.st_dev, stat_result.st_ino, stat_result.st_mtime_ns, stat_result.st_size)
+        etag = self._etags.get(key)
+        if etag is not None:
+            self._etags.move_to_end(key)
+            return etag
+
+        etag = await run_in_threadpool(self.compute, path, stat_result)
+        self._etags[key] = etag
+        if len(self._etags) > self.maxsize:
+            self._etags.popitem(last=False)
+        return etag
+
+
+etag_cache = ETagCache()
+
+
+class StaticFileResponse(FileResponse):
+    """
+    FileResponse with larger chunks. Range, multi-range and If-Range are handled by FileResponse,
+    and the whole file is sent by 'http.response.pathsend' (zero-copy) if the server supports it.
+    """
+    chunk_size = 1024 * 1024
+
+    async def _handle_multiple_ranges(self, send, ranges, file_size, send_header_only) -> None:
+        # FileResponse puts 'multipart/byteranges' type into 'content-range' header. send it as 'content-type'.
+        async def send_multipart(message):
+            if message["type"] == "http.response.start":
+                headers = [(k, v) for k, v in message["headers"] if k not in (b"content-type", b"content-range")]
+                message = {**message, "headers": headers + [(b"content-type", self.headers["content-range"].encode())]}
+            await send(message)
+
+        await super()._handle_multiple_ranges(send_multipart, ranges, file_size, send_header_only)
+
+
+def resolve_path(file_path: str, root: str = FILE_ROOT) -> str:
+    # symlinks and '..' are resolved first, so nothing outside of root is reachable
+    path = os.path.realpath(os.path.join(root, file_path))
+    if os.path.commonpath([root, path]) != root:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+    return path
+
+def is_not_modified(request: Request, etag: str, mtime: float) -> bool:
+    # If-Modified-Since is ignored when If-None-Match is sent (RFC 9110)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return any(tag.strip().removeprefix("W/") in (etag, "*") for tag in if_none_match.split(","))
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+async def serve_file(request: Request, file_path: str, root: str = FILE_ROOT) -> Response:
+    path = resolve_path(file_path, root)
+    try:
+        stat_result = await run_in_threadpool(os.stat, path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+
+    etag = await etag_cache.get(path, stat_result)
+    headers: dict = {"etag": etag,
+                     "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+                     "cache-control": f"public, max-age={FILE_MAX_AGE}"}
+    if is_not_modified(request, etag, stat_result.st_mtime):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return StaticFileResponse(path=path, stat_result=stat_result, headers=headers, method=request.method)
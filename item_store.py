@@ -0,0 +1,138 @@
+import math
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Iterable, Iterator
+
+
+class SortedIndex:
+    """
+    (key, item id) pairs kept sorted with bisect. Lookup is O(log n) and range scan is O(log n + k).
+    Insert / remove shift the array (memmove), which is fast enough up to millions of items.
+    """
+    def __init__(self, entries: Iterable[tuple[Any, int]] = ()):
+        self._entries: list[tuple[Any, int]] = sorted(entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, key: Any, item_id: int):
+        insort(self._entries, (key, item_id))
+
+    def remove(self, key: Any, item_id: int):
+        position = bisect_left(self._entries, (key, item_id))
+        if position < len(self._entries) and self._entries[position] == (key, item_id):
+            del self._entries[position]
+
+    def range(self, min_key: Any = None, max_key: Any = None, desc: bool = False) -> Iterator[int]:
+        """ids of items with min_key <= key <= max_key (None: unbounded), in key order"""
+        lo = 0 if min_key is None else bisect_left(self._entries, (min_key,))
+        hi = len(self._entries) if max_key is None else bisect_right(self._entries, (max_key, math.inf))
+        positions = range(hi - 1, lo - 1, -1) if desc else range(lo, hi)
+        return (self._entries[position][1] for position in positions)
+
+
+class ItemStore:
+    """
+    Items (dict with 'id') in an array with an id -> position index, so get / update / delete are O(1).
+
+    - delete: the slot becomes a tombstone (None). when tombstones are more than 'compact_ratio' of the array,
+              live items are moved to a new array and positions are rebuilt (amortized O(1)).
+    - id: allocated from a monotonic counter, so ids of deleted items are never reused.
+    - sorted_indexes: fields kept in SortedIndex for range(), e.g. ["price"].
+    """
+    def __init__(self, items: Iterable[dict] = (), compact_ratio: float = 0.5, sorted_indexes: Iterable[str] = ()):
+        self.compact_ratio = compact_ratio
+        self.sorted_indexes: dict[str, SortedIndex] = {}
+        self._slots: list[dict | None] = []
+        self._positions: dict[int, int] = {}
+        self._tombstones: int = 0
+        self.last_id: int = 0
+        for item in items:
+            if item.get("id") is None or item["id"] in self._positions:
+                self.add(item)
+                continue
+
+            # fast path of add() for loading
+            self._positions[item["id"]] = len(self._slots)
+            self._slots.append(item)
+            if item["id"] > self.last_id:
+                self.last_id = item["id"]
+
+        # sort once after loading, instead of insort per item
+        self.sorted_indexes = {field: SortedIndex((item[field], item["id"]) for item in self if item.get(field) is not None)
+                               for field in sorted_indexes}
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __iter__(self) -> Iterator[dict]:
+        return (item for item in self._slots if item is not None)
+
+    def __contains__(self, item_id: int) -> bool:
+        return item_id in self._positions
+
+    def next_id(self) -> int:
+        self.last_id += 1
+        return self.last_id
+
+    def get(self, item_id: int) -> dict | None:
+        position = self._positions.get(item_id)
+        return self._slots[position] if position is not None else None
+
+    def add(self, item: dict) -> dict:
+        """add item with its own 'id', or with a new id if it has no 'id'"""
+        if item.get("id") is None:
+            item = {"id": self.next_id(), **item}
+        elif item["id"] in self._positions:
+            raise ValueError(f"Item id '{item['id']}' is already exist")
+        else:
+            self.last_id = max(self.last_id, item["id"])
+
+        self._positions[item["id"]] = len(self._slots)
+        self._slots.append(item)
+        self._index(item)
+        return item
+
+    def update(self, item_id: int, values: dict) -> dict | None:
+        item = self.get(item_id)
+        if item is not None:
+            self._unindex(item)
+            item.update({k: v for k, v in values.items() if k != "id"})
+            self._index(item)
+        return item
+
+    def delete(self, item_id: int) -> dict | None:
+        position = self._positions.pop(item_id, None)
+        if position is None:
+            return None
+
+        item = self._slots[position]
+        self._slots[position] = None
+        self._unindex(item)
+        self._tombstones += 1
+        if self._tombstones > len(self._slots) * self.compact_ratio:
+            self.compact()
+        return item
+
+    async def commit(self):
+        """make writes durable. nothing to do for items in memory."""
+        pass
+
+    def compact(self):
+        self._slots = [item for item in self._slots if item is not None]
+        self._positions = {item["id"]: position for position, item in enumerate(self._slots)}
+        self._tombstones = 0
+
+    def _index(self, item: dict):
+        for field, index in self.sorted_indexes.items():
+            if item.get(field) is not None:
+                index.add(item[field], item["id"])
+
+    def _unindex(self, item: dict):
+        for field, index in self.sorted_indexes.items():
+            if item.get(field) is not None:
+                index.remove(item[field], item["id"])
+
+    def range(self, field: str, min_value: Any = None, max_value: Any = None, desc: bool = False) -> Iterator[dict]:
+        """items with min_value <= field <= max_value in order of the field, from its SortedIndex"""
+        return (self._slots[self._positions[item_id]]
+                for item_id in self.sorted_indexes[field].range(min_value, max_value, desc))
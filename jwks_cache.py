@@ -0,0 +1,86 @@
+import time
+import asyncio
+import httpx
+import jwt
+
+
+class JWKSCache:
+    """
+    Verifier-side cache of the issuer's JWKS for resource servers.
+    Keys are refreshed in background (conditional GET with ETag) and once more on unknown 'kid',
+    so tokens are verified locally without calling the issuer per request.
+
+    usage:
+        jwks = JWKSCache(jwks_url="http://127.0.0.1:8000/.well-known/jwks.json")
+
+        @asynccontextmanager
+        async def lifespan(app: FastAPI):
+            jwks.start()
+            yield
+            await jwks.stop()
+
+        payload = await jwks.decode(token, audience="client-tester-12345")
+    """
+    def __init__(self,
+                 jwks_url: str,
+                 refresh_seconds: float = 300,
+                 min_refresh_seconds: float = 10,
+                 transport: httpx.AsyncBaseTransport | None = None):
+        self.jwks_url = jwks_url
+        self.transport = transport
+        self.refresh_seconds = refresh_seconds
+        self.min_refresh_seconds = min_refresh_seconds
+        self.keys: dict[str, jwt.PyJWK] = {}
+        self._etag: str | None = None
+        self._refreshed_at: float = 0.0
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    async def refresh(self, force: bool = False):
+        async with self._lock:
+            # unknown kid from many requests triggers only one fetch per 'min_refresh_seconds'
+            if not force and time.monotonic() - self._refreshed_at < self.min_refresh_seconds:
+                return
+
+            headers: dict = {"If-None-Match": self._etag} if self._etag else {}
+            async with httpx.AsyncClient(timeout=5, transport=self.transport) as client:
+                response = await client.get(self.jwks_url, headers=headers)
+            self._refreshed_at = time.monotonic()
+
+            if response.status_code == 304:
+                return
+
+            response.raise_for_status()
+            data = response.json()
+            if not isinstance(data, dict):
+                raise jwt.PyJWKSetError("JWKS must be a JSON object")
+            jwk_set = jwt.PyJWKSet.from_dict(data)
+            self.keys = {key.key_id: key for key in jwk_set.keys}
+            self._etag = response.headers.get("etag")
+
+    async def _refresh_periodically(self):
+        while True:
+            try:
+                await self.refresh(force=True)
+            except (httpx.HTTPError, jwt.PyJWTError, ValueError):
+                pass        # keep verifying with cached keys until issuer is reachable and returns valid JWKS
+            await asyncio.sleep(self.refresh_seconds)
+
+    def start(self):
+        self._task = asyncio.create_task(self._refresh_periodically())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def decode(self, token: str, **kwargs) -> dict:
+        kid = jwt.get_unverified_header(token).get("kid")
+        key = self.keys.get(kid)
+        if key is None:
+            await self.refresh()
+            key = self.keys.get(kid)
+
+        if key is None:
+            raise jwt.InvalidKeyError(f"Unknown kid '{kid}'")
+        return jwt.decode(token, key=key.key, algorithms=[key.algorithm_name], **kwargs)
@@ -1,4 +1,6 @@
 import re
+import json
+import time
 from typing import Annotated, Optional
 from enum import Enum
 from fastapi import (FastAPI,
@@ -10,18 +12,29 @@ from fastapi import (FastAPI,
                      Response,
                      Form,
                      UploadFile,
-                     File,
                      HTTPException,
                      status,
-                     Depends)
+                     Depends,
+                     Request)
 from dataclasses import dataclass
-from fastapi.responses import RedirectResponse, JSONResponse
+from fastapi.responses import RedirectResponse, JSONResponse, StreamingResponse
 from fastapi.encoders import jsonable_encoder
 from pydantic import (BaseModel,
                       AfterValidator,
                       HttpUrl,
                       EmailStr)
 
+from catalog import Catalog
+from file_server import serve_file
+from metrics import MetricsMiddleware, router as metrics_router
+from response_cache import CachedRoute, cached_response
+from upload_stream import (IngestedFile,
+                           ingest_upload_files,
+                           iter_completed,
+                           multipart_openapi,
+                           receive_files,
+                           receive_parts)
+
 
 class OSType(Enum):
     windows = "windows"
@@ -33,6 +46,9 @@ data = [{"type": "pc", "product": "Thinkpad"},
         {"type": "cellphone", "product": "Iphone14"},
         {"type": "cellphone", "product": "GalaxyS25"}]
 
+# rows of data indexed by type, for get_items
+catalog = Catalog(rows=data, indexes=["type"])
+
 class Data(BaseModel):
     name: str
     age: int
@@ -59,6 +75,10 @@ class Image(BaseModel):
     url: HttpUrl
 
 app = FastAPI()
+app.add_middleware(MetricsMiddleware)
+app.include_router(router=metrics_router)
+# endpoints with @cached_response are served from rendered bytes
+app.router.route_class = CachedRoute
 
 """
 @app.get(path="/")
@@ -77,9 +97,10 @@ async def get_os(os_type: OSType):
 
     return {"msg": "ERROR", "OS": None}
 
-@app.get(path="/file/{file_path:path}")
-async def get_file(file_path) -> dict:
-    return {"msg": "OK", "file_path": file_path}
+# serve files under FILE_ROOT with Range, ETag and Last-Modified
+@app.api_route(path="/file/{file_path:path}", methods=["GET", "HEAD"])
+async def get_file(file_path: str, request: Request):
+    return await serve_file(request=request, file_path=file_path)
 
 @app.get(path="/product")
 async def get_product(start_idx: int = 0, end_idx: int = 10):
@@ -106,10 +127,7 @@ def validate_p_type(p_type: str):
 
 @app.get(path="/items")
 async def get_items(p_type: Annotated[str, AfterValidator(validate_p_type)]):
-    result = {"msg": "OK", "data": []}
-    for d in data:
-        if p_type == d["type"]: result["data"].append(d)
-    return result
+    return {"msg": "OK", "data": catalog.find(type=p_type)}
 
 # test
 @app.get("/items/{item_id}")
@@ -246,6 +264,7 @@ async def login2(user: LoginTemplate) -> LoginTemplate:
 
 # Return Response
 @app.get(path="/response")
+@cached_response(max_age=60)
 async def response(redirect: bool = False) -> Response:
     url = "https://github.com"
     return RedirectResponse(url=url) if redirect else JSONResponse(content={"msg": "ok", "url": url})
@@ -288,20 +307,51 @@ async def legacy_login(login_input: Annotated[LoginInput, Form()]):
 async def upload_file(file: UploadFile):
     return {"msg": "ok", "filename": file.filename, "size": file.size}
 
-@app.post("/upload_file2/", tags=["files"])
-async def create_file(file: Annotated[bytes, File()]):
-    if not file:
+# streaming upload: body is written to UPLOAD_DIR chunk by chunk, not read into memory as bytes
+@app.post("/upload_file2/", tags=["files"], openapi_extra=multipart_openapi(field="file"))
+async def create_file(request: Request):
+    files: list[IngestedFile] = await receive_files(request)
+    if not files:
         return {"message": "No file sent"}
     else:
-        return {"file_size": len(file)}
+        return {"file_size": files[0].size, "sha256": files[0].sha256}
 
+# files are hashed, sniffed and stored concurrently (UPLOAD_CONCURRENCY)
 @app.post(path="/upload_files", tags=["files"])
 async def upload_multiple_files(files: list[UploadFile]):
-    return {"msg": "ok", "filenames": [ f.filename for f in files ]}
-
-@app.post(path="/upload_files2", tags=["files"])
-async def upload_multiple_files2(files: Annotated[list[bytes], File()]):
-    return {"msg": "ok", "filesize": [ len(f) for f in files ]}
+    results: list[IngestedFile] = await ingest_upload_files(files)
+    return {"msg": "ok", "filenames": [ f.filename for f in files ], "files": [ r.model_dump(exclude={"path"}) for r in results ]}
+
+async def stream_ingest_progress(tasks: set, start: float):
+    # one NDJSON line per file as soon as it is stored, and the summary at last
+    count, size = 0, 0
+    async for file in iter_completed(tasks):
+        if isinstance(file, BaseException):
+            yield json.dumps({"msg": "error", "detail": str(file)}) + "\n"
+            continue
+        count, size = count + 1, size + file.size
+        yield file.model_dump_json(exclude={"path"}) + "\n"
+
+    seconds = time.perf_counter() - start
+    yield json.dumps({"msg": "ok",
+                      "files": count,
+                      "size": size,
+                      "seconds": seconds,
+                      "throughput": size / seconds if seconds > 0 else 0.0}) + "\n"
+
+@app.post(path="/upload_files2", tags=["files"], openapi_extra=multipart_openapi(field="files", multiple=True))
+async def upload_multiple_files2(request: Request, progress: bool = False):
+    if progress:
+        # the body is received here (files are processed meanwhile), then files are reported as they are done
+        start = time.perf_counter()
+        tasks = await receive_parts(request)
+        return StreamingResponse(content=stream_ingest_progress(tasks, start), media_type="application/x-ndjson")
+
+    files: list[IngestedFile] = await receive_files(request)
+    return {"msg": "ok",
+            "filesize": [ f.size for f in files ],
+            "sha256": [ f.sha256 for f in files ],
+            "throughput": [ f.throughput for f in files ]}
 
 # HTTPException
 regex_dt = re.compile(r"^\d{4}-\d{1,2}-\d{1,2}$")
@@ -314,6 +364,7 @@ async def get_data(date: str):
 
 # jsonable_encoder
 @app.get(path="/jsonable")
+@cached_response(max_age=60)
 async def jsonable_test():
     json_encoded = jsonable_encoder(Product(name="test product",
                                             version=1.0,
@@ -0,0 +1,251 @@
+import os
+import json
+import atexit
+import time
+import threading
+from bisect import bisect_left
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+# metrics config from env var
+# - METRICS_DIR: directory shared by uvicorn workers. every worker writes its counters to its own file
+#                and /metrics sums the files, so any worker answers for all of them. unset: this process only.
+#                clear it before starting the server, files of stopped workers are kept for their counters.
+# - METRICS_FLUSH_INTERVAL: seconds between writes of the counters of this worker to METRICS_DIR
+metrics_dir: str | None = os.getenv("METRICS_DIR") or None
+metrics_flush_interval: float = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+
+# upper bounds (sec) of request latency histogram, log scale (1-2.5-5 per decade) from 1ms to 10s
+LATENCY_BUCKETS: tuple = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+# route label of requests not matched to any route (404, docs, mounted apps), not to make a label per path
+UNMATCHED_ROUTE: str = "<unmatched>"
+
+
+class RouteStats:
+    """Counters of one (method, route, status). Changed only on the event loop, so no lock."""
+    __slots__ = ("counts", "total", "request_bytes", "response_bytes")
+
+    def __init__(self):
+        self.counts: list[int] = [0] * len(LATENCY_BUCKETS)
+        self.total: float = 0.0
+        self.request_bytes: int = 0
+        self.response_bytes: int = 0
+
+    def observe(self, seconds: float, request_bytes: int, response_bytes: int):
+        self.counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.request_bytes += request_bytes
+        self.response_bytes += response_bytes
+
+
+class MetricsRegistry:
+    """
+    Per-process counters: latency histogram and byte counters per (method, route, status),
+    and requests in progress per method.
+    With METRICS_DIR, a daemon thread writes them to '<pid>.<start>.json' every METRICS_FLUSH_INTERVAL.
+    """
+    def __init__(self):
+        self.pid: int = os.getpid()
+        self.started: int = time.time_ns()
+        self.routes: dict[tuple[str, str, str], RouteStats] = {}
+        self.in_progress: dict[str, int] = {}
+        self._lock = threading.Lock()       # only for new keys and snapshot
+        self._flush_lock = threading.Lock()
+        self._flusher: threading.Thread | None = None
+
+    def reset(self):
+        # counters copied by fork() belong to the parent process
+        with self._lock:
+            self.pid, self.started = os.getpid(), time.time_ns()
+            self.routes, self.in_progress = {}, {}
+            self._flusher = None
+
+    def route(self, key: tuple[str, str, str]) -> RouteStats:
+        stats = self.routes.get(key)
+        if stats is None:
+            with self._lock:
+                stats = self.routes.setdefault(key, RouteStats())
+        return stats
+
+    def enter(self, method: str):
+        if method not in self.in_progress:
+            with self._lock:
+                self.in_progress.setdefault(method, 0)
+        self.in_progress[method] += 1
+
+    def exit(self, method: str):
+        self.in_progress[method] -= 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            routes = list(self.routes.items())
+            in_progress = dict(self.in_progress)
+        return {"pid": self.pid,
+                "routes": [[*key, list(stats.counts), stats.total, stats.request_bytes, stats.response_bytes]
+                           for key, stats in routes],
+                "in_progress": in_progress}
+
+    @property
+    def path(self) -> str:
+        return os.path.join(metrics_dir, f"{self.pid}.{self.started}.json")
+
+    def flush(self):
+        path = self.path
+        with self._flush_lock:
+            with open(path + ".tmp", "w") as f:
+                json.dump(self.snapshot(), f)
+            os.replace(path + ".tmp", path)
+
+    def start_flusher(self):
+        if metrics_dir is None or self._flusher is not None:
+            return
+        os.makedirs(metrics_dir, exist_ok=True)
+        atexit.register(self.flush)
+        self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+        self._flusher.start()
+
+    def _flush_periodically(self):
+        while self._flusher is threading.current_thread():
+            self.flush()
+            time.sleep(metrics_flush_interval)
+
+
+registry = MetricsRegistry()
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (no BaseHTTPMiddleware task / body copy) recording latency, status and bytes of requests.
+    The route label is the path template of the matched route (e.g. '/items/{item_id}'), set in scope by the router.
+    Latency is until the last body chunk is sent, so streaming responses count their whole body.
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if registry.pid != os.getpid():
+            registry.reset()
+        registry.start_flusher()
+
+        method: str = scope["method"]
+        status_code: int = 500
+        request_bytes: int = 0
+        response_bytes: int = 0
+
+        async def receive_counted() -> Message:
+            nonlocal request_bytes
+            message = await receive()
+            if message["type"] == "http.request":
+                request_bytes += len(message.get("body", b""))
+            return message
+
+        async def send_counted(message: Message):
+            nonlocal status_code, response_bytes
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        registry.enter(method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive_counted, send_counted)
+        finally:
+            elapsed = time.perf_counter() - start
+            registry.exit(method)
+            route = scope.get("route")
+            path = getattr(route, "path_format", None) or UNMATCHED_ROUTE
+            registry.route((method, path, str(status_code))).observe(elapsed, request_bytes, response_bytes)
+
+
+def collect() -> dict:
+    """counters of this process, or the sum of every worker in METRICS_DIR"""
+    if metrics_dir is None:
+        return registry.snapshot()
+
+    registry.flush()
+    routes: dict[tuple[str, str, str], list] = {}
+    in_progress: dict[str, int] = {}
+    for name in os.listdir(metrics_dir):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(metrics_dir, name)) as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            continue
+
+        for method, path, status_code, counts, total, request_bytes, response_bytes in data["routes"]:
+            merged = routes.setdefault((method, path, status_code), [[0] * len(LATENCY_BUCKETS), 0.0, 0, 0])
+            merged[0] = [a + b for a, b in zip(merged[0], counts)]
+            merged[1] += total
+            merged[2] += request_bytes
+            merged[3] += response_bytes
+
+        # gauge: only of running workers
+        if pid_alive(data["pid"]):
+            for method, count in data["in_progress"].items():
+                in_progress[method] = in_progress.get(method, 0) + count
+
+    return {"routes": [[*key, *values] for key, values in routes.items()], "in_progress": in_progress}
+
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render(data: dict) -> str:
+    """Prometheus text exposition format (version 0.0.4)"""
+    histogram: list[str] = ["# HELP http_request_duration_seconds Latency of HTTP requests until the last body chunk.",
+                            "# TYPE http_request_duration_seconds histogram"]
+    request_size: list[str] = ["# HELP http_request_size_bytes_total Bytes of HTTP request bodies.",
+                               "# TYPE http_request_size_bytes_total counter"]
+    response_size: list[str] = ["# HELP http_response_size_bytes_total Bytes of HTTP response bodies.",
+                                "# TYPE http_response_size_bytes_total counter"]
+
+    for method, path, status_code, counts, total, request_bytes, response_bytes in sorted(data["routes"]):
+        labels = f'method="{escape(method)}",route="{escape(path)}",status="{status_code}"'
+        # cumulative counts of requests <= bucket bound
+        cumulative: int = 0
+        for bound, count in zip(LATENCY_BUCKETS, counts):
+            cumulative += count
+            histogram.append(f'http_request_duration_seconds_bucket{{{labels},le="{"+Inf" if bound == float("inf") else bound}"}} {cumulative}')
+        histogram.append(f"http_request_duration_seconds_sum{{{labels}}} {total}")
+        histogram.append(f"http_request_duration_seconds_count{{{labels}}} {cumulative}")
+        request_size.append(f"http_request_size_bytes_total{{{labels}}} {request_bytes}")
+        response_size.append(f"http_response_size_bytes_total{{{labels}}} {response_bytes}")
+
+    in_progress: list[str] = ["# HELP http_requests_in_progress HTTP requests being handled.",
+                              "# TYPE http_requests_in_progress gauge"]
+    for method, count in sorted(data["in_progress"].items()):
+        in_progress.append(f'http_requests_in_progress{{method="{escape(method)}"}} {count}')
+
+    return "\n".join(histogram + request_size + response_size + in_progress) + "\n"
+
+
+router = APIRouter(tags=["Metrics"])
+
+@router.get(path="/metrics",
+            response_class=PlainTextResponse,
+            summary="Get request latency, size and in-progress metrics in Prometheus text format.")
+def get_metrics():
+    # sync: reading the files of workers runs in the threadpool
+    return PlainTextResponse(content=render(collect()), media_type="text/plain; version=0.0.4; charset=utf-8")
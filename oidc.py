@@ -1,15 +1,33 @@
 from asyncio import start_unix_server
 
+import os
 import jwt
+import json
+import time
+import base64
+import fcntl
+import asyncio
+import hashlib
+import heapq
+from pathlib import Path
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa, ec, ed25519
+from jwt.algorithms import get_default_algorithms
 from datetime import datetime, timedelta, timezone
 from typing_extensions import Annotated, Doc
 
 from jwt import PyJWTError
 from pydantic import BaseModel, EmailStr
 from fastapi import FastAPI, Depends, Request, Response, HTTPException, status, Form
+from fastapi.concurrency import run_in_threadpool
 from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
 
+from metrics import MetricsMiddleware, router as metrics_router
+from password_hasher import check_password, router as password_hasher_router
+
 
 dummy_data: dict = {
     "alex@test.com": {
@@ -44,8 +62,139 @@ dummy_data: dict = {
     }
 }
 
+# JWT Setting
+# tokens are signed with asymmetric keys, so resource servers verify them with public keys in JWKS.
+# - JWT_ALGORITHM: algorithm of keys generated by the server (RS256 | ES256 | EdDSA)
+# - JWT_KEY_DIR: directory of PEM private keys shared by every worker (and kept over restarts). newest file signs tokens.
+#                when it has no key or its newest key is older than JWT_KEY_ROTATION_SECONDS, one worker adds a new key
+#                (under a file lock) and the others load it. keys can also be added by hand
+#                (e.g. 'openssl genpkey -algorithm ed25519'). every worker / host must see the same directory.
+# - JWT_KEY_ROTATION_SECONDS: max age of the newest key. 0 disables rotation by the server
+SIGNING_ALGORITHM: str = os.getenv("JWT_ALGORITHM", "ES256")
+KEY_DIR: str = os.getenv("JWT_KEY_DIR", "./jwt_keys")
+KEY_ROTATION_SECONDS: int = int(os.getenv("JWT_KEY_ROTATION_SECONDS", "86400"))
+KEY_RELOAD_SECONDS: int = 60        # interval to reload JWT_KEY_DIR (also minimum interval on unknown kid)
+KEY_RING_SIZE: int = 3              # current key + previous keys to verify tokens issued before rotation
+ISSUER: str = "http://127.0.0.1:8000-tester"
+BASE_URL: str = "http://127.0.0.1:8000"
+JWKS_MAX_AGE: int = 300
+
+def generate_private_key(algorithm: str):
+    if algorithm == "RS256":
+        return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    if algorithm == "ES256":
+        return ec.generate_private_key(ec.SECP256R1())
+    if algorithm == "EdDSA":
+        return ed25519.Ed25519PrivateKey.generate()
+    raise ValueError(f"Unsupported signing algorithm '{algorithm}'")
+
+def get_key_algorithm(private_key) -> str:
+    if isinstance(private_key, rsa.RSAPrivateKey):
+        return "RS256"
+    if isinstance(private_key, ec.EllipticCurvePrivateKey):
+        return "ES256"
+    if isinstance(private_key, ed25519.Ed25519PrivateKey):
+        return "EdDSA"
+    raise ValueError(f"Unsupported key type '{type(private_key).__name__}'")
+
+class SigningKey:
+    def __init__(self, private_key):
+        self.private_key = private_key
+        self.public_key = private_key.public_key()
+        self.algorithm = get_key_algorithm(private_key)
+
+        jwk: dict = json.loads(get_default_algorithms()[self.algorithm].to_jwk(self.public_key))
+        # RFC 7638 thumbprint as kid, so every worker derives the same kid for the same key
+        required: dict = {k: v for k, v in jwk.items() if k in ("crv", "e", "kty", "n", "x", "y")}
+        thumbprint = hashlib.sha256(json.dumps(required, sort_keys=True, separators=(",", ":")).encode()).digest()
+        self.kid = base64.urlsafe_b64encode(thumbprint).rstrip(b"=").decode()
+        self.jwk: dict = {**jwk, "kid": self.kid, "alg": self.algorithm, "use": "sig"}
+
+class KeyRing:
+    """
+    Signing keys (newest first) and the JWKS bytes / ETag precomputed at every rotation.
+    """
+    def __init__(self, size: int):
+        self.size = size
+        self.keys: list[SigningKey] = []
+        self._by_kid: dict[str, SigningKey] = {}
+        self.jwks: bytes = b""
+        self.jwks_etag: str = ""
+        self.loaded_at: float = 0.0
+
+    def set_keys(self, keys: list[SigningKey]):
+        self.keys = keys[:self.size]
+        self._by_kid = {key.kid: key for key in self.keys}
+        self.jwks = json.dumps({"keys": [key.jwk for key in self.keys]}).encode()
+        self.jwks_etag = f'"{hashlib.sha256(self.jwks).hexdigest()[:32]}"'
+
+    def load(self, key_dir: str):
+        files = sorted(Path(key_dir).glob("*.pem"), key=lambda f: f.stat().st_mtime, reverse=True)
+        if not files:
+            raise RuntimeError(f"There is no PEM private key in '{key_dir}'")
+
+        self.loaded_at = time.monotonic()
+        self.set_keys([SigningKey(serialization.load_pem_private_key(f.read_bytes(), password=None))
+                       for f in files[:self.size]])
+
+    @property
+    def current(self) -> SigningKey:
+        return self.keys[0]
+
+    def get(self, kid: str | None) -> SigningKey | None:
+        return self._by_kid.get(kid)
+
+def add_key(key_dir: str):
+    """write a new private key, which becomes the signing key on the next load"""
+    pem = generate_private_key(SIGNING_ALGORITHM).private_bytes(encoding=serialization.Encoding.PEM,
+                                                                format=serialization.PrivateFormat.PKCS8,
+                                                                encryption_algorithm=serialization.NoEncryption())
+    path = os.path.join(key_dir, f"{time.time_ns()}.pem")
+    with os.fdopen(os.open(path + ".tmp", os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb") as f:
+        f.write(pem)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+def add_key_if_due(key_dir: str):
+    """add a new PEM to key_dir if it has no key or the newest one is due for rotation"""
+    os.makedirs(key_dir, exist_ok=True)
+    # one worker adds the key, the others wait and see the new file
+    with open(os.path.join(key_dir, ".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        files = sorted(Path(key_dir).glob("*.pem"), key=lambda f: f.stat().st_mtime, reverse=True)
+        if files and (KEY_ROTATION_SECONDS <= 0 or time.time() - files[0].stat().st_mtime < KEY_ROTATION_SECONDS):
+            return
+
+        add_key(key_dir)
+        # keys out of the ring verify nothing any more
+        for old_file in files[KEY_RING_SIZE - 1:]:
+            old_file.unlink(missing_ok=True)
+
+def refresh_key_ring():
+    add_key_if_due(KEY_DIR)
+    key_ring.load(KEY_DIR)
+
+key_ring = KeyRing(size=KEY_RING_SIZE)
+refresh_key_ring()
+
+@asynccontextmanager
+async def rotate_keys(app: FastAPI):
+    async def rotate_periodically():
+        while True:
+            await asyncio.sleep(KEY_RELOAD_SECONDS)
+            await run_in_threadpool(refresh_key_ring)
+
+    task = asyncio.create_task(rotate_periodically())
+    yield
+    task.cancel()
+
+
 # Initiate FastAPI Instance
-app = FastAPI(title="ODIC Test")
+app = FastAPI(title="ODIC Test", lifespan=rotate_keys)
+app.include_router(router=password_hasher_router)
+app.include_router(router=metrics_router)
+app.add_middleware(MetricsMiddleware)
 
 # CORS Settings
 origins: list = [
@@ -63,10 +212,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# JWT Setting
-SECRET_KEY: str = "ThisIs@SecretkEy"
-ALGORITHM: str = "HS256"
-
 # define JWT Token Class
 class AuthJWT(BaseModel):
     iss: str = "http://127.0.0.1:8000-tester"
@@ -92,26 +237,121 @@ class CustomPasswordInput:
         self.email = email
         self.password = password
 
+# Verified Token Cache
+TOKEN_CACHE_SIZE: int = 10000
+TOKEN_CACHE_MAX_TTL: int = 300      # seconds
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU cache of verified claims keyed by sha256 digest of the token.
+    Claims are kept until the token's 'exp' (at most 'max_ttl' seconds) and revoked tokens are never served.
+    Revoked digests are kept until their 'exp' and evicted in order of it through a heap.
+    """
+    def __init__(self, maxsize: int, max_ttl: int):
+        self.maxsize = maxsize
+        self.max_ttl = max_ttl
+        self._claims: OrderedDict[tuple[str, str], tuple[float, dict]] = OrderedDict()
+        self._revoked: dict[str, float] = {}
+        self._revoked_expiry: list[tuple[float, str]] = []      # heap of (exp, digest)
+
+    @staticmethod
+    def digest(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, kind: str, digest: str) -> dict | None:
+        entry = self._claims.get((kind, digest))
+        if entry is None:
+            return None
+
+        expire_at, claims = entry
+        if expire_at <= time.time() or digest in self._revoked:
+            del self._claims[(kind, digest)]
+            return None
+
+        self._claims.move_to_end((kind, digest))
+        return claims
+
+    def set(self, kind: str, digest: str, claims: dict):
+        expire_at = min(claims.get("exp", float("inf")), time.time() + self.max_ttl)
+        self._claims[(kind, digest)] = (expire_at, claims)
+        self._claims.move_to_end((kind, digest))
+        while len(self._claims) > self.maxsize:
+            self._claims.popitem(last=False)
+
+    def revoke(self, digest: str, exp: float):
+        # expired tokens are rejected by verification, so they need not be remembered
+        now = time.time()
+        while self._revoked_expiry and self._revoked_expiry[0][0] <= now:
+            _, expired = heapq.heappop(self._revoked_expiry)
+            self._revoked.pop(expired, None)
+
+        if exp > now and digest not in self._revoked:
+            self._revoked[digest] = exp
+            heapq.heappush(self._revoked_expiry, (exp, digest))
+        for kind in ("access", "auth"):
+            self._claims.pop((kind, digest), None)
+
+    def is_revoked(self, digest: str) -> bool:
+        return digest in self._revoked
+
+token_cache = VerifiedTokenCache(maxsize=TOKEN_CACHE_SIZE, max_ttl=TOKEN_CACHE_MAX_TTL)
+
+
 # function to create and decode token
 def create_token(payload: dict):
-    return jwt.encode(payload=payload, key=SECRET_KEY, algorithm=ALGORITHM)
+    key = key_ring.current
+    return jwt.encode(payload=payload, key=key.private_key, algorithm=key.algorithm, headers={"kid": key.kid})
+
+def verify_token(token: str, **kwargs) -> dict:
+    kid = jwt.get_unverified_header(token).get("kid")
+    key = key_ring.get(kid)
+
+    # another worker may already sign with a new key in JWT_KEY_DIR
+    if key is None and time.monotonic() - key_ring.loaded_at > KEY_RELOAD_SECONDS:
+        key_ring.load(KEY_DIR)
+        key = key_ring.get(kid)
+
+    if key is None:
+        raise jwt.InvalidKeyError(f"Unknown kid '{kid}'")
+
+    # every token must expire, so revoked tokens are kept only until 'exp'
+    options: dict = {"require": ["exp"], **kwargs.pop("options", {})}
+    return jwt.decode(jwt=token, key=key.public_key, algorithms=[key.algorithm], options=options, **kwargs)
 
 def decode_access_token(token: str):
+    digest = token_cache.digest(token)
+    if token_cache.is_revoked(digest):
+        return None
+
+    payload = token_cache.get(kind="access", digest=digest)
+    if payload is not None:
+        return payload
+
     try:
-        payload: dict = jwt.decode(jwt=token, key=SECRET_KEY, algorithms=[ALGORITHM])
+        payload: dict = verify_token(token=token)
 
     except jwt.PyJWTError:
         return None
 
+    token_cache.set(kind="access", digest=digest, claims=payload)
     return payload
 
 def decode_auth_token(token: str):
+    digest = token_cache.digest(token)
+    if token_cache.is_revoked(digest):
+        return None
+
+    payload = token_cache.get(kind="auth", digest=digest)
+    if payload is not None:
+        return payload
+
     try:
-        payload: dict = jwt.decode(jwt=token, key=SECRET_KEY, algorithms=[ALGORITHM], audience="client-tester-12345")
+        payload: dict = verify_token(token=token, audience="client-tester-12345")
 
     except PyJWTError:
         return None
 
+    token_cache.set(kind="auth", digest=digest, claims=payload)
     return payload
 
 # Define API
@@ -122,7 +362,9 @@ def decode_auth_token(token: str):
 #async def login(user_input: UserInput):
 async def login(user_input = Depends(CustomPasswordInput)):
     user: dict | None = dummy_data.get(user_input.email) or None
-    if user is None or user.get("password") != user_input.password:
+    if user is None or not await check_password(password=user_input.password,
+                                                hashed=user.get("password"),
+                                                save_hash=lambda new_hash: user.update({"password": new_hash})):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                             detail="Mismatch email and password")
 
@@ -142,6 +384,7 @@ async def login(user_input = Depends(CustomPasswordInput)):
 
     access_token_payload: dict = {
         "sub": user.get("email"),
+        "exp": int(access_token_exp.timestamp()),
         "scope": ["product:read", "product:write"]
     }
 
@@ -193,4 +436,51 @@ async def get_user_scope(request: Request):  # Authorization 헤더를 읽기 
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                             detail="Invalid Access Token")
 
-    return payload
\ No newline at end of file
+    return payload
+
+
+@app.post(path="/oauth/revoke/",
+          tags=["OIDC"],
+          summary="Revoke auth or access token.")
+async def revoke_token(token: Annotated[str, Form()]):
+    # only tokens signed by this server are recorded. response is same for any token (RFC 7009)
+    try:
+        payload: dict = verify_token(token=token, options={"verify_aud": False})
+    except PyJWTError:
+        return {"result": "ok"}
+
+    token_cache.revoke(digest=token_cache.digest(token), exp=payload["exp"])
+    return {"result": "ok"}
+
+
+
+# JWKS and Discovery: served from precomputed bytes with ETag
+discovery_document: bytes = json.dumps({
+    "issuer": ISSUER,
+    "jwks_uri": f"{BASE_URL}/.well-known/jwks.json",
+    "token_endpoint": f"{BASE_URL}/oauth/token/",
+    "userinfo_endpoint": f"{BASE_URL}/userinfo/",
+    "revocation_endpoint": f"{BASE_URL}/oauth/revoke/",
+    "response_types_supported": ["token", "id_token"],
+    "subject_types_supported": ["public"],
+    "id_token_signing_alg_values_supported": ["RS256", "ES256", "EdDSA"],
+}).encode()
+discovery_etag: str = f'"{hashlib.sha256(discovery_document).hexdigest()[:32]}"'
+
+def etag_response(request: Request, content: bytes, etag: str, max_age: int) -> Response:
+    headers: dict = {"ETag": etag, "Cache-Control": f"public, max-age={max_age}"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=content, media_type="application/json", headers=headers)
+
+@app.get(path="/.well-known/jwks.json",
+         tags=["OIDC"],
+         summary="Public keys to verify tokens.")
+async def get_jwks(request: Request):
+    return etag_response(request=request, content=key_ring.jwks, etag=key_ring.jwks_etag, max_age=JWKS_MAX_AGE)
+
+@app.get(path="/.well-known/openid-configuration",
+         tags=["OIDC"],
+         summary="OpenID Provider discovery document.")
+async def get_openid_configuration(request: Request):
+    return etag_response(request=request, content=discovery_document, etag=discovery_etag, max_age=86400)
@@ -0,0 +1,35 @@
+import json
+import base64
+from fastapi import HTTPException, status
+
+
+# keyset pagination: the cursor is the sort key of the last row of a page, with the column it belongs to.
+# the sort column must be unique (e.g. id, name), so rows after the cursor are exactly the next page.
+
+def encode_cursor(order_by: str, value) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"order_by": order_by, "value": value}).encode()).decode()
+
+def decode_cursor(cursor: str, order_by: str, value_type: type):
+    try:
+        decoded = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        decoded = None
+
+    # value must be of the type of the column, or the query fails in DB
+    if (not isinstance(decoded, dict)
+            or decoded.get("order_by") != order_by
+            or type(decoded.get("value")) is not value_type):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Invalid cursor for order_by '{order_by}'")
+    return decoded["value"]
+
+def paginate(statement, sort_column, order_by: str, value_type: type, cursor: str | None, desc: bool, limit: int):
+    """statement of one page: rows after the cursor in sort order, at most 'limit'"""
+    if cursor is not None:
+        last_value = decode_cursor(cursor, order_by, value_type)
+        statement = statement.where(sort_column < last_value if desc else sort_column > last_value)
+    return statement.order_by(sort_column.desc() if desc else sort_column).limit(limit)
+
+def next_cursor(rows: list, order_by: str, limit: int) -> str | None:
+    """cursor of the page after 'rows', None on the last page"""
+    return encode_cursor(order_by, getattr(rows[-1], order_by)) if len(rows) == limit else None
@@ -0,0 +1,145 @@
+import os
+import hmac
+import time
+import base64
+import asyncio
+import hashlib
+import inspect
+from typing import Any, Callable
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from fastapi import APIRouter, HTTPException, status
+from pydantic import BaseModel
+
+
+# hasher config from env var
+# - PASSWORD_SCRYPT_N / _R / _P: scrypt cost. changed cost is applied by rehash on next login.
+# - PASSWORD_HASH_WORKERS: size of worker pool
+# - PASSWORD_HASH_MAX_PENDING: max queued + running hashes before rejecting new ones
+# - PASSWORD_HASH_EXECUTOR: 'thread' (scrypt releases the GIL) or 'process'
+scrypt_n: int = int(os.getenv("PASSWORD_SCRYPT_N", str(2 ** 14)))
+scrypt_r: int = int(os.getenv("PASSWORD_SCRYPT_R", "8"))
+scrypt_p: int = int(os.getenv("PASSWORD_SCRYPT_P", "1"))
+hash_workers: int = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+hash_max_pending: int = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+hash_executor: str = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+class HasherStats(BaseModel):
+    pending: int = 0            # queued + running (queue depth)
+    completed: int = 0
+    rejected: int = 0
+    wait_seconds_sum: float = 0.0
+    run_seconds_sum: float = 0.0
+
+
+def b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode()
+
+def run_scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> tuple[bytes, float]:
+    # module level function, so it can be pickled for ProcessPoolExecutor
+    start = time.perf_counter()
+    digest = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * 1024 * 1024, dklen=32)
+    return digest, time.perf_counter() - start
+
+
+class PasswordHasher:
+    """
+    scrypt hashing in a bounded worker pool, so login bursts do not block the event loop.
+    Hash format: 'scrypt$n$r$p$salt$digest' (salt / digest in base64).
+    """
+    def __init__(self, n: int, r: int, p: int, executor: Executor, max_pending: int):
+        self.n = n
+        self.r = r
+        self.p = p
+        self.executor = executor
+        self.max_pending = max_pending
+        self.stats = HasherStats()
+
+    async def _scrypt(self, password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+        if self.stats.pending >= self.max_pending:
+            self.stats.rejected += 1
+            raise PasswordHasherBusy("Too many password hashes are pending")
+
+        self.stats.pending += 1
+        start = time.perf_counter()
+        try:
+            digest, run_seconds = await asyncio.get_running_loop().run_in_executor(
+                self.executor, run_scrypt, password, salt, n, r, p)
+        finally:
+            self.stats.pending -= 1
+
+        self.stats.completed += 1
+        self.stats.run_seconds_sum += run_seconds
+        self.stats.wait_seconds_sum += time.perf_counter() - start - run_seconds
+        return digest
+
+    async def hash(self, password: str) -> str:
+        salt = os.urandom(16)
+        digest = await self._scrypt(password, salt, self.n, self.r, self.p)
+        return f"scrypt${self.n}${self.r}${self.p}${b64encode(salt)}${b64encode(digest)}"
+
+    async def verify(self, password: str, hashed: str) -> tuple[bool, str | None]:
+        """
+        Verify password against stored hash.
+
+        :param password: password in plain text from user
+        :param hashed: stored hash (or legacy plain text password)
+        :return: (matched, new hash to store if cost is changed or stored value is plain text)
+        """
+        if not hashed.startswith("scrypt$"):
+            matched = hmac.compare_digest(password.encode(), hashed.encode())
+            return matched, await self.hash(password) if matched else None
+
+        _, n, r, p, salt, digest = hashed.split("$")
+        computed = await self._scrypt(password, base64.b64decode(salt), int(n), int(r), int(p))
+        if not hmac.compare_digest(computed, base64.b64decode(digest)):
+            return False, None
+
+        if (int(n), int(r), int(p)) != (self.n, self.r, self.p):
+            return True, await self.hash(password)
+        return True, None
+
+
+password_hasher = PasswordHasher(n=scrypt_n,
+                                 r=scrypt_r,
+                                 p=scrypt_p,
+                                 executor=(ProcessPoolExecutor(max_workers=hash_workers) if hash_executor == "process"
+                                           else ThreadPoolExecutor(max_workers=hash_workers)),
+                                 max_pending=hash_max_pending)
+
+
+async def check_password(password: str, hashed: str, save_hash: Callable[[str], Any]) -> bool:
+    """
+    Verify a login password in the worker pool. A busy pool is answered with 503.
+
+    :param password: password in plain text from user
+    :param hashed: stored hash (or legacy plain text password)
+    :param save_hash: called (and awaited if it returns an awaitable) with the new hash to store,
+                      when the password matched and the stored value is plain text or of an outdated cost
+    :return: matched
+    """
+    try:
+        matched, new_hash = await password_hasher.verify(password=password, hashed=hashed)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="Too many login requests. Try again later.",
+                            headers={"Retry-After": "1"})
+
+    if new_hash is not None:
+        saved = save_hash(new_hash)
+        if inspect.isawaitable(saved):
+            await saved
+    return matched
+
+
+router = APIRouter(tags=["Password Hasher"])
+
+@router.get(path="/password_hasher/stats",
+            response_model=HasherStats,
+            summary="Get queue depth and latency of password hashing.")
+async def get_hasher_stats():
+    return password_hasher.stats
@@ -1,11 +1,20 @@
+import io
+import csv
+import json
 from contextlib import asynccontextmanager
-from typing import Annotated, Optional
-from fastapi import FastAPI, HTTPException, Depends, Path, status
-from sqlmodel import SQLModel, Session, Field, create_engine, select, func
+from typing import Annotated, Literal, Optional
+from fastapi import FastAPI, HTTPException, Depends, Path, Query, Request, status
+from sqlmodel import SQLModel, Session, Field, select, update, delete, func, text
+from sqlalchemy.dialects.postgresql import insert
 from sqlmodel.sql.expression import and_, or_
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 
+from bulk_io import BulkFormat, MEDIA_TYPES, import_records, stream_rows
+from db_engine import create_db_engine, router as db_pool_router
+from pagination import next_cursor, paginate
+from metrics import MetricsMiddleware, router as metrics_router
+
 
 # define table named 'Hero'
 class HeroInput(BaseModel):
@@ -24,6 +33,12 @@ class Hero(HeroInput, SQLModel, table=True):
     """
     id: int | None = Field(primary_key=True, default=None)   # Auto Increment (primary_key and default None)
 
+class HeroPage(BaseModel):
+    data: list[Hero]
+    next_cursor: str | None = None          # pass as 'cursor' to get the next page
+    total: int | None = None
+    total_is_approximate: bool = False
+
 
 # set vars for PostgreSQL DB connection
 host: str = "127.0.0.1"
@@ -34,16 +49,28 @@ db_name: str = "postgres"
 
 # create sql engine
 postgresql_url: str = f"postgresql://{username}:{password}@{host}:{port}/{db_name}"
-engine = create_engine(url=postgresql_url)
+engine = create_db_engine(name="rdbms", url=postgresql_url)
 
 
+# trigram GIN indexes on lower(name) / lower(secret_name) serve both '%x%' and 'x%' LIKE search
+HERO_SEARCH_DDL: list[str] = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_hero_name_trgm ON hero USING gin (lower(name) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_hero_secret_name_trgm ON hero USING gin (lower(secret_name) gin_trgm_ops)",
+]
+
 # define function to create database and table
 def create_db_and_table():
     SQLModel.metadata.create_all(engine)
 
+    with engine.begin() as conn:
+        for ddl in HERO_SEARCH_DDL:
+            conn.execute(text(ddl))
+
 # define function to get session
 def get_session():
-    with Session(engine) as session:
+    # rows returned by 'RETURNING' stay loaded after commit (no refresh query)
+    with Session(engine, expire_on_commit=False) as session:
         yield session
 
 # define function to set action at startup
@@ -56,34 +83,76 @@ async def startup_event(app: FastAPI):
 
 # create FastAPI instance
 app = FastAPI(lifespan=startup_event)
+app.include_router(router=db_pool_router)
+app.include_router(router=metrics_router)
+app.add_middleware(MetricsMiddleware)
+
+
+# sort key types of the cursor (id and name are unique)
+CURSOR_TYPES: dict[str, type] = {"id": int, "name": str}
+
+def estimate_count(session: Session, statement) -> int:
+    # planner estimate from 'EXPLAIN' instead of scanning every matched row
+    compiled = statement.compile(dialect=engine.dialect)
+    plan = session.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
 
 
 @app.get(path="/hero/",
          tags=["DB Test"],
-         response_model=list[Hero],
+         response_model=HeroPage,
          summary="Get All Hero Information")
 async def get_hero(name: str | None = None,
                    age: int | None = None,
                    secret_name: str | None = None,
-                   session: Session = Depends(get_session)) -> list[Hero]:
+                   match: Literal["substring", "prefix"] = "substring",
+                   limit: Annotated[int, Query(ge=1, le=1000)] = 100,
+                   cursor: str | None = None,
+                   order_by: Literal["id", "name"] = "id",
+                   desc: bool = False,
+                   count: Literal["none", "exact", "approximate"] = "none",
+                   session: Session = Depends(get_session)) -> HeroPage:
 
     statement = select(Hero)
     where_condition = []
 
+    # lower(column) LIKE is served by the trigram index (3+ characters)
+    pattern = "{}%" if match == "prefix" else "%{}%"
+
     if name is not None:
-        where_condition.append(func.lower(Hero.name).like(f"%{name.lower()}%"))
+        where_condition.append(func.lower(Hero.name).like(pattern.format(name.lower())))
 
     if age  is not None:
         where_condition.append(Hero.age == age)
 
     if secret_name is not None:
-        where_condition.append(func.lower(Hero.secret_name).like(f"%{secret_name.lower()}%"))
+        where_condition.append(func.lower(Hero.secret_name).like(pattern.format(secret_name.lower())))
 
     if len(where_condition) != 0:
         statement = statement.where(or_(*where_condition))
 
+    total: int | None = None
+    if count == "exact":
+        total = session.exec(select(func.count()).select_from(statement.subquery())).one()
+    elif count == "approximate":
+        total = estimate_count(session=session, statement=statement)
+
+    # keyset pagination: continue after the last sort key instead of OFFSET
+    statement = paginate(statement=statement,
+                         sort_column=getattr(Hero, order_by),
+                         order_by=order_by,
+                         value_type=CURSOR_TYPES[order_by],
+                         cursor=cursor,
+                         desc=desc,
+                         limit=limit)
     heros = session.exec(statement=statement).all()
-    return heros
+
+    return HeroPage(data=heros,
+                    next_cursor=next_cursor(heros, order_by, limit),
+                    total=total,
+                    total_is_approximate=count == "approximate")
 
 @app.post(path="/hero/",
           tags=["DB Test"],
@@ -93,16 +162,20 @@ async def add_hero(hero: HeroInput,
 
     # hero = Hero(**hero.__dict__)         # this code will bypass pydantic validation logic
     hero = Hero.model_validate(hero)
-    check_exist = session.exec(select(Hero).where(Hero.name==hero.name)).one_or_none()
 
-    if check_exist is not None:
+    # one statement: insert unless the name exists, and get the new row back
+    statement = (insert(Hero)
+                 .values(**hero.model_dump(exclude={"id"}))
+                 .on_conflict_do_nothing(index_elements=[Hero.name])
+                 .returning(Hero))
+    new_hero = session.exec(statement).scalar_one_or_none()
+
+    if new_hero is None:
         return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST,
                             content={"result": "Fail", "msg": "Already Exist Name"})
 
-    session.add(hero)
     session.commit()
-    session.refresh(hero)       # update current referenced table
-    return {"result": "OK", "data": hero}
+    return {"result": "OK", "data": new_hero}
 
 
 @app.delete(path="/hero/{id}",
@@ -111,14 +184,12 @@ async def add_hero(hero: HeroInput,
 async def delete_hero(id: Annotated[int, Path(gt=0)],
                       session: Session = Depends(get_session)):
 
-    exist_hero = session.exec(select(Hero).where(Hero.id==id)).one_or_none()
-    if exist_hero is None:
+    deleted_id = session.exec(delete(Hero).where(Hero.id==id).returning(Hero.id)).scalar_one_or_none()
+    if deleted_id is None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail=f"No Hero Exist with id '{id}'")
 
-    session.delete(exist_hero)
     session.commit()
-    session.delete(exist_hero)
     return {"result": "OK"}
 
 
@@ -128,17 +199,66 @@ async def delete_hero(id: Annotated[int, Path(gt=0)],
 async def update_hero(id: Annotated[int, Path(ge=1)],
                       hero: HeroInputUpdate,
                       session: Session = Depends(get_session)):
-    exist_hero = session.exec(select(Hero).where(Hero.id==id)).one_or_none()
-    if exist_hero is None:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                            detail=f"No Hero Exist with id '{id}'")
-
     update_data = hero.model_dump(exclude_unset=True)
 
-    for key, value in update_data.items():
-        setattr(exist_hero, key, value)
+    if update_data:
+        statement = update(Hero).where(Hero.id==id).values(**update_data).returning(Hero.id)
+    else:
+        # empty body only checks the existence
+        statement = select(Hero.id).where(Hero.id==id)
+
+    updated_id = session.exec(statement).first()
+    if updated_id is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"No Hero Exist with id '{id}'")
 
-    session.add(exist_hero)
     session.commit()
-    session.refresh(exist_hero)
     return {"result": "OK"}
+
+
+
+# Batch Import / Export
+IMPORT_BATCH_SIZE: int = 10000
+EXPORT_BATCH_SIZE: int = 10000
+HERO_FIELDS: list[str] = ["id", "name", "age", "secret_name"]
+
+def copy_heroes(rows: list[dict]) -> int:
+    # COPY the batch into a temp table, then move it with one INSERT which skips existing names
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([row["name"], row["age"], row["secret_name"]] for row in rows)
+    buffer.seek(0)
+
+    with engine.begin() as conn:
+        cursor = conn.connection.cursor()
+        # only the imported columns: no id column and its nextval() default, so no sequence value is used here
+        cursor.execute("CREATE TEMP TABLE hero_import ON COMMIT DROP AS "
+                       "SELECT name, age, secret_name FROM hero WITH NO DATA")
+        # csv.writer writes '' as an empty field, which COPY reads as NULL. name / secret_name are never None
+        cursor.copy_expert("COPY hero_import (name, age, secret_name) FROM STDIN "
+                           "WITH (FORMAT csv, FORCE_NOT_NULL (name, secret_name))", buffer)
+        cursor.execute("INSERT INTO hero (name, age, secret_name) "
+                       "SELECT name, age, secret_name FROM hero_import "
+                       "ON CONFLICT (name) DO NOTHING")
+        return cursor.rowcount
+
+
+@app.post(path="/hero/import",
+          summary="Import heroes from NDJSON or CSV body",
+          tags=["DB Test"],
+          openapi_extra={"requestBody": {"required": True,
+                                         "content": {media_type: {} for media_type in MEDIA_TYPES.values()}}})
+async def import_hero(request: Request):
+    counts = await import_records(request=request, model=HeroInput, write_batch=copy_heroes, batch_size=IMPORT_BATCH_SIZE)
+    return {"result": "OK", **counts}
+
+
+@app.get(path="/hero/export",
+         summary="Export every hero as NDJSON or CSV",
+         tags=["DB Test"])
+async def export_hero(format: BulkFormat = "ndjson"):
+    return StreamingResponse(content=stream_rows(engine=engine,
+                                                 statement=select(Hero.__table__).order_by(Hero.id),
+                                                 bulk_format=format,
+                                                 fields=HERO_FIELDS,
+                                                 batch_size=EXPORT_BATCH_SIZE),
+                             media_type=MEDIA_TYPES[format])
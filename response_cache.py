@@ -0,0 +1,127 @@
+import os
+import json
+import hashlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable
+from fastapi import Request, Response, status
+from fastapi.dependencies.utils import get_flat_dependant, request_params_to_args
+
+from fast_json import FastJSONRoute
+
+
+# global cache version from env var. bump it on deploy to change every ETag
+RESPONSE_CACHE_VERSION: str = os.getenv("RESPONSE_CACHE_VERSION", "1")
+
+
+@dataclass
+class ResponseCachePolicy:
+    max_age: int = 60
+    maxsize: int = 128          # max number of cached responses per route, least recently used one is evicted
+    version: int = 0            # bumped by invalidate()
+    entries: OrderedDict = field(default_factory=OrderedDict)
+
+
+class CachedResponse(Response):
+    """
+    Response from precomputed body and raw headers (no rendering, no header encoding).
+    """
+    def __init__(self, body: bytes, raw_headers: list[tuple[bytes, bytes]], status_code: int = status.HTTP_200_OK):
+        self.status_code = status_code
+        self.body = body
+        self.raw_headers = list(raw_headers)
+        self.background = None
+
+
+@dataclass
+class CacheEntry:
+    version: int
+    etag: str
+    body: bytes
+    raw_headers: list[tuple[bytes, bytes]]
+    not_modified_headers: list[tuple[bytes, bytes]]
+
+
+def cached_response(max_age: int = 60, maxsize: int = 128):
+    """
+    Mark an endpoint to be served from its rendered response bytes with ETag and Cache-Control.
+    Only routes of CachedRoute class use the mark. Cache key is the validated query parameters declared
+    by the endpoint (undeclared ones and their order are ignored), so use it only for endpoints whose response
+    depends on nothing else (no path parameter, header, cookie, body).
+    """
+    def decorator(endpoint: Callable) -> Callable:
+        endpoint.response_cache = ResponseCachePolicy(max_age=max_age, maxsize=maxsize)
+        return endpoint
+    return decorator
+
+def invalidate(endpoint: Callable):
+    """drop cached responses of the endpoint. the next request renders them again with a new ETag."""
+    policy: ResponseCachePolicy = endpoint.response_cache
+    policy.version += 1
+    policy.entries.clear()
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    return any(tag.strip().removeprefix("W/") in (etag, "*") for tag in if_none_match.split(","))
+
+
+class CachedRoute(FastJSONRoute):
+    """
+    Route class which serves endpoints marked by @cached_response from cache.
+    The first 200 response per query parameters is stored, later requests skip the endpoint,
+    jsonable_encoder and JSON serialization, and 'If-None-Match' is answered with 304.
+    Other endpoints are handled by FastJSONRoute.
+    """
+    def get_route_handler(self) -> Callable:
+        route_handler = super().get_route_handler()
+        policy: ResponseCachePolicy | None = getattr(self.endpoint, "response_cache", None)
+        if policy is None:
+            return route_handler
+        query_fields = get_flat_dependant(self.dependant, skip_repeats=True).query_params
+
+        def cache_key(request: Request) -> str | None:
+            # None: invalid query, left to the route handler (422) and not cached
+            values, errors = request_params_to_args(query_fields, request.query_params)
+            if errors:
+                return None
+            return json.dumps(values, sort_keys=True, default=str)
+
+        def render(response: Response) -> CacheEntry:
+            etag = f'"{hashlib.sha256(RESPONSE_CACHE_VERSION.encode() + response.body).hexdigest()[:32]}"'
+            cache_headers = [(b"etag", etag.encode()),
+                             (b"cache-control", f"public, max-age={policy.max_age}".encode())]
+            raw_headers = [(k, v) for k, v in response.raw_headers if k not in (b"etag", b"cache-control")]
+            return CacheEntry(version=policy.version,
+                              etag=etag,
+                              body=response.body,
+                              raw_headers=raw_headers + cache_headers,
+                              not_modified_headers=cache_headers)
+
+        async def cached_route_handler(request: Request) -> Response:
+            key: str | None = cache_key(request)
+            if key is None:
+                return await route_handler(request)
+
+            entry: CacheEntry | None = policy.entries.get(key)
+            if entry is not None and entry.version == policy.version:
+                policy.entries.move_to_end(key)
+            else:
+                response = await route_handler(request)
+                # only plain 200 responses (not streaming, no background task) are stored
+                if (response.status_code != status.HTTP_200_OK or response.background is not None
+                        or not hasattr(response, "body")):
+                    return response
+
+                entry = render(response)
+                policy.entries[key] = entry
+                policy.entries.move_to_end(key)
+                if len(policy.entries) > policy.maxsize:
+                    policy.entries.popitem(last=False)
+
+            if_none_match: str | None = request.headers.get("if-none-match")
+            if if_none_match is not None and etag_matches(if_none_match, entry.etag):
+                return CachedResponse(body=b"",
+                                      raw_headers=entry.not_modified_headers,
+                                      status_code=status.HTTP_304_NOT_MODIFIED)
+            return CachedResponse(body=entry.body, raw_headers=entry.raw_headers)
+
+        return cached_route_handler
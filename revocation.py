@@ -0,0 +1,147 @@
+import math
+import time
+import threading
+import hashlib
+from sqlalchemy import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import SQLModel, Field, Session, select, delete, func
+
+
+class BloomFilter:
+    """
+    Bit array with 'k' positions per item from double hashing of sha256.
+    False positive rate is about 'error_rate' up to 'capacity' items. Items can not be removed.
+    """
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count: int = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.sha256(item.encode()).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:16], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevokedToken(SQLModel, table=True):
+    __tablename__ = "revoked_token"
+    id: int | None = Field(default=None, primary_key=True)
+    jti: str = Field(index=True, unique=True)
+    expire_at: float = Field(index=True)
+    created_at: float = Field(index=True)                      # sync cursor for other workers
+
+
+class RevocationList:
+    """
+    Revoked token ids (jti). 'revoked_token' table is the authoritative store shared by workers,
+    and each worker keeps a Bloom filter of it, so most 'is_revoked' calls never query the table.
+
+    - sync: rows added by other workers are loaded at most once per 'sync_interval' seconds
+            (a token revoked on other worker may be accepted for this interval).
+            rows are read by 'created_at' from 'sync_overlap' seconds before the last sync, so rows committed
+            late (ids / timestamps do not commit in order) or written by a worker with a skewed clock are not missed.
+    - prune: expired rows are deleted and the filter is rebuilt once per 'prune_interval' seconds.
+    In async handlers, check 'might_be_revoked' inline and call the blocking 'maintain' / 'confirm' from the threadpool.
+    """
+    def __init__(self,
+                 engine: Engine,
+                 capacity: int = 100000,
+                 error_rate: float = 0.01,
+                 sync_interval: float = 1,
+                 sync_overlap: float = 30,
+                 prune_interval: float = 600):
+        self.engine = engine
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self.sync_overlap = sync_overlap
+        self.prune_interval = prune_interval
+        self._maintenance_lock = threading.Lock()       # one sync / prune at a time, and no add to a replaced filter
+        SQLModel.metadata.create_all(engine, tables=[RevokedToken.__table__])
+        self.rebuild()
+
+    def rebuild(self):
+        # cursor is taken before the scan, so rows committed during the scan are read by the next sync
+        started = time.time()
+        with Session(self.engine) as session:
+            count = session.exec(select(func.count()).select_from(RevokedToken).where(RevokedToken.expire_at > started)).one()
+            bloom = BloomFilter(capacity=max(self.capacity, count * 2), error_rate=self.error_rate)
+            for jti in session.exec(select(RevokedToken.jti).where(RevokedToken.expire_at > started)):
+                bloom.add(jti)
+
+        self.bloom = bloom
+        self._sync_from = started - self.sync_overlap
+        self._synced_at = self._pruned_at = time.monotonic()
+
+    def sync(self):
+        started = time.time()
+        with Session(self.engine) as session:
+            for jti in session.exec(select(RevokedToken.jti).where(RevokedToken.created_at > self._sync_from)):
+                # rows of the overlap are read again, and must not count twice toward the capacity
+                if jti not in self.bloom:
+                    self.bloom.add(jti)
+        self._sync_from = started - self.sync_overlap
+        self._synced_at = time.monotonic()
+
+        # filter became too dense to keep the error rate
+        if self.bloom.count > self.bloom.capacity:
+            self.rebuild()
+
+    def prune(self):
+        with Session(self.engine) as session:
+            session.exec(delete(RevokedToken).where(RevokedToken.expire_at <= time.time()))
+            session.commit()
+        self.rebuild()
+
+    def revoke(self, jti: str, expire_at: float):
+        with Session(self.engine) as session:
+            session.add(RevokedToken(jti=jti, expire_at=expire_at, created_at=time.time()))
+            try:
+                session.commit()
+            except IntegrityError:
+                pass        # revoked already (e.g. by a concurrent logout of the same token)
+
+        # not to add to a filter being replaced by prune / rebuild of other thread
+        with self._maintenance_lock:
+            self.bloom.add(jti)
+
+    def maintenance_due(self) -> bool:
+        return time.monotonic() - self._synced_at > self.sync_interval
+
+    def maintain(self):
+        """sync or prune if due. skipped while other thread does it"""
+        if not self._maintenance_lock.acquire(blocking=False):
+            return
+        try:
+            if time.monotonic() - self._pruned_at > self.prune_interval:
+                self.prune()
+            elif self.maintenance_due():
+                self.sync()
+        finally:
+            self._maintenance_lock.release()
+
+    def might_be_revoked(self, jti: str) -> bool:
+        """fast negative check in memory. True includes false positives, confirm them with 'confirm'"""
+        return jti in self.bloom
+
+    def confirm(self, jti: str) -> bool:
+        with Session(self.engine) as session:
+            statement = select(RevokedToken.id).where(RevokedToken.jti == jti, RevokedToken.expire_at > time.time())
+            return session.exec(statement).first() is not None
+
+    def is_revoked(self, jti: str) -> bool:
+        """blocking check: maintain, then only possible hits (including false positive) query the table"""
+        if self.maintenance_due():
+            self.maintain()
+        return self.might_be_revoked(jti) and self.confirm(jti)
@@ -0,0 +1,143 @@
+import time
+import heapq
+import uuid
+from abc import ABC, abstractmethod
+from sqlalchemy import Engine
+from sqlmodel import SQLModel, Field, Session, select, delete
+
+
+class SessionStore(ABC):
+    """
+    Login sessions with TTL. Expired sessions are never returned and are removed by sweep().
+    'blocking' stores do I/O, so async handlers call them from the threadpool.
+    """
+    blocking: bool = False
+
+    @abstractmethod
+    def create(self, username: str, ttl: float) -> str:
+        ...
+
+    @abstractmethod
+    def get(self, session_id: str) -> str | None:
+        """return username of the session if it is not expired"""
+        ...
+
+    @abstractmethod
+    def has_user(self, username: str) -> bool:
+        ...
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        ...
+
+    @abstractmethod
+    def sweep(self) -> int:
+        """remove expired sessions and return the number of them"""
+        ...
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    O(1) lookup by session id and by username, and a min-heap of expire time.
+    sweep() only pops expired heads of the heap, so each session is removed once.
+    Not thread-safe (no lock): call it only from the event loop.
+    """
+    def __init__(self):
+        self._sessions: dict[str, tuple[str, float]] = {}
+        self._by_user: dict[str, set[str]] = {}
+        self._expire_heap: list[tuple[float, str]] = []
+
+    def create(self, username: str, ttl: float) -> str:
+        self.sweep()
+        session_id = str(uuid.uuid4())
+        expire_at = time.time() + ttl
+        self._sessions[session_id] = (username, expire_at)
+        self._by_user.setdefault(username, set()).add(session_id)
+        heapq.heappush(self._expire_heap, (expire_at, session_id))
+        return session_id
+
+    def get(self, session_id: str) -> str | None:
+        session = self._sessions.get(session_id)
+        if session is None or session[1] <= time.time():
+            return None
+        return session[0]
+
+    def has_user(self, username: str) -> bool:
+        now = time.time()
+        return any(self._sessions[session_id][1] > now for session_id in self._by_user.get(username, ()))
+
+    def delete(self, session_id: str) -> None:
+        # heap entry is left and skipped by sweep()
+        session = self._sessions.pop(session_id, None)
+        if session is None:
+            return
+
+        session_ids = self._by_user[session[0]]
+        session_ids.discard(session_id)
+        if not session_ids:
+            del self._by_user[session[0]]
+
+    def sweep(self) -> int:
+        removed: int = 0
+        now = time.time()
+        while self._expire_heap and self._expire_heap[0][0] <= now:
+            _, session_id = heapq.heappop(self._expire_heap)
+            if session_id in self._sessions:
+                self.delete(session_id)
+                removed += 1
+        return removed
+
+
+class UserSession(SQLModel, table=True):
+    __tablename__ = "user_session"
+    session_id: str = Field(primary_key=True)
+    username: str = Field(index=True)
+    expire_at: float = Field(index=True)
+
+
+class SQLSessionStore(SessionStore):
+    """
+    Sessions in 'user_session' table shared by every worker process.
+    Expired rows are deleted at most once per 'sweep_interval' seconds on create().
+    """
+    blocking: bool = True
+
+    def __init__(self, engine: Engine, sweep_interval: float = 60):
+        self.engine = engine
+        self.sweep_interval = sweep_interval
+        self._swept_at: float = 0.0
+        SQLModel.metadata.create_all(engine, tables=[UserSession.__table__])
+
+    def create(self, username: str, ttl: float) -> str:
+        if time.monotonic() - self._swept_at > self.sweep_interval:
+            self.sweep()
+
+        session_id = str(uuid.uuid4())
+        with Session(self.engine) as session:
+            session.add(UserSession(session_id=session_id, username=username, expire_at=time.time() + ttl))
+            session.commit()
+        return session_id
+
+    def get(self, session_id: str) -> str | None:
+        with Session(self.engine) as session:
+            statement = select(UserSession.username).where(UserSession.session_id == session_id,
+                                                           UserSession.expire_at > time.time())
+            return session.exec(statement).first()
+
+    def has_user(self, username: str) -> bool:
+        with Session(self.engine) as session:
+            statement = select(UserSession.session_id).where(UserSession.username == username,
+                                                             UserSession.expire_at > time.time())
+            return session.exec(statement).first() is not None
+
+    def delete(self, session_id: str) -> None:
+        with Session(self.engine) as session:
+            session.exec(delete(UserSession).where(UserSession.session_id == session_id))
+            session.commit()
+
+    def sweep(self) -> int:
+        self._swept_at = time.monotonic()
+        with Session(self.engine) as session:
+            removed = session.exec(delete(UserSession).where(UserSession.expire_at <= time.time())).rowcount
+            session.commit()
+        return removed
@@ -1,21 +1,30 @@
 from contextlib import asynccontextmanager
-from typing import Annotated, Optional
+from typing import Annotated, Literal, Optional
 from pydantic import BaseModel
 from fastapi import (FastAPI,
                      Depends,
                      HTTPException,
                      Path,
                      Query,
+                     Request,
                      status)
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlmodel import (SQLModel,
                       Field,
                       Session,
                       select,
-                      create_engine,
-                      func)
+                      update,
+                      delete,
+                      func,
+                      text)
+from sqlalchemy import table, column
+from sqlalchemy.dialects.sqlite import insert
 from sqlmodel.sql.expression import or_
 
+from bulk_io import BulkFormat, MEDIA_TYPES, import_records, stream_rows
+from db_engine import create_db_engine, router as db_pool_router
+from pagination import next_cursor, paginate
+
 
 # Define Table
 class HeroInput(BaseModel):
@@ -31,14 +40,20 @@ class HeroUpdateInput(HeroInput):
 class Hero(HeroInput, SQLModel, table=True):
     id: int = Field(default=None, primary_key=True)
 
+class HeroPage(BaseModel):
+    data: list[Hero]
+    next_cursor: str | None = None          # pass as 'cursor' to get the next page
+    total: int | None = None
+
 # Config for sqlite file
 SQL_FILE: str = "./sqlite3_test.db"
 SQL_URL: str = f"sqlite:///{SQL_FILE}"
 
 # create sqlite engine
-engine = create_engine(url=SQL_URL,
-                       echo=True,                                     # will print out SQL Query in terminal
-                       connect_args={"check_same_thread": False})     # will allow multiple threads (especially in SQLite3)
+# SQL echo and pool size are set by env var (see db_engine.py)
+engine = create_db_engine(name="sqlite_test",
+                          url=SQL_URL,
+                          connect_args={"check_same_thread": False})     # will allow multiple threads (especially in SQLite3)
 
 
 @asynccontextmanager
@@ -49,41 +64,96 @@ async def start_db(app: FastAPI):
 
     print("--- Termination of DB Session ---")
 
+# FTS5 trigram index for name / secret_name search, kept in sync with 'hero' by triggers
+hero_fts = table("hero_fts", column("rowid"), column("name"), column("secret_name"))
+HERO_FTS_DDL: list[str] = [
+    """CREATE VIRTUAL TABLE hero_fts USING fts5(name, secret_name,
+                                                content='hero', content_rowid='id', tokenize='trigram')""",
+    """CREATE TRIGGER hero_fts_ai AFTER INSERT ON hero BEGIN
+           INSERT INTO hero_fts(rowid, name, secret_name) VALUES (new.id, new.name, new.secret_name);
+       END""",
+    """CREATE TRIGGER hero_fts_ad AFTER DELETE ON hero BEGIN
+           INSERT INTO hero_fts(hero_fts, rowid, name, secret_name) VALUES ('delete', old.id, old.name, old.secret_name);
+       END""",
+    """CREATE TRIGGER hero_fts_au AFTER UPDATE ON hero BEGIN
+           INSERT INTO hero_fts(hero_fts, rowid, name, secret_name) VALUES ('delete', old.id, old.name, old.secret_name);
+           INSERT INTO hero_fts(rowid, name, secret_name) VALUES (new.id, new.name, new.secret_name);
+       END""",
+    # index heroes which were stored before hero_fts existed
+    "INSERT INTO hero_fts(hero_fts) VALUES ('rebuild')",
+]
+
 def create_db_table():
     SQLModel.metadata.create_all(engine)
 
+    with engine.begin() as conn:
+        exist_fts = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'hero_fts'")).first()
+        if exist_fts is None:
+            for ddl in HERO_FTS_DDL:
+                conn.execute(text(ddl))
+
 def get_session():
-    with Session(engine) as session:
+    # rows returned by 'RETURNING' stay loaded after commit (no refresh query)
+    with Session(engine, expire_on_commit=False) as session:
         yield session
 
 # create FastAPI instance and run
 app = FastAPI(lifespan=start_db)
+app.include_router(router=db_pool_router)
+
+
+# sort key types of the cursor (id and name are unique)
+CURSOR_TYPES: dict[str, type] = {"id": int, "name": str}
 
 
 @app.get(path="/hero/",
          tags=["sqlite_test"],
          summary="Get Hero' Information",
-         response_model=list[Hero])
+         response_model=HeroPage)
 async def get_hero(session: Annotated[Session, Depends(get_session)],
                    name: str | None = None,
                    age: int | None = None,
-                   secret_name: str | None = None):
+                   secret_name: str | None = None,
+                   match: Literal["substring", "prefix"] = "substring",
+                   limit: Annotated[int, Query(ge=1, le=1000)] = 100,
+                   cursor: str | None = None,
+                   order_by: Literal["id", "name"] = "id",
+                   desc: bool = False,
+                   count: Literal["none", "exact"] = "none"):
     statement = select(Hero)
     condition: list = []
 
+    # trigram LIKE on hero_fts is case-insensitive and uses the FTS index (3+ characters)
+    pattern = "{}%" if match == "prefix" else "%{}%"
+
     if name is not None:
-        condition.append(func.lower(Hero.name).like(f"%{name.lower()}%"))
+        condition.append(Hero.id.in_(select(hero_fts.c.rowid).where(hero_fts.c.name.like(pattern.format(name)))))
 
     if age is not None:
         condition.append(Hero.age == age)
 
     if secret_name is not None:
-        condition.append(func.lower(Hero.secret_name).like(f"%{secret_name.lower()}%"))
+        condition.append(Hero.id.in_(select(hero_fts.c.rowid).where(hero_fts.c.secret_name.like(pattern.format(secret_name)))))
 
     if condition:
         statement = select(Hero).where(or_(*condition))
 
-    return session.exec(statement).all()
+    # sqlite has no planner estimate, so total is an exact count only when requested
+    total: int | None = None
+    if count == "exact":
+        total = session.exec(select(func.count()).select_from(statement.subquery())).one()
+
+    # keyset pagination: continue after the last sort key instead of OFFSET
+    statement = paginate(statement=statement,
+                         sort_column=getattr(Hero, order_by),
+                         order_by=order_by,
+                         value_type=CURSOR_TYPES[order_by],
+                         cursor=cursor,
+                         desc=desc,
+                         limit=limit)
+    heros = session.exec(statement).all()
+
+    return HeroPage(data=heros, next_cursor=next_cursor(heros, order_by, limit), total=total)
 
 @app.post(path="/hero/",
           tags=["sqlite_test"],
@@ -94,19 +164,20 @@ async def add_hero(hero: HeroInput,
     # validate input
     hero = Hero.model_validate(hero)
 
-    # check unique value
-    exist_hero = session.exec(select(Hero).where(Hero.name==hero.name)).one_or_none()
-    if exist_hero is not None:
+    # add to database unless the name exists (unique check and insert in one statement)
+    statement = (insert(Hero)
+                 .values(**hero.model_dump(exclude={"id"}))
+                 .on_conflict_do_nothing(index_elements=[Hero.name])
+                 .returning(Hero))
+    new_hero = session.exec(statement).scalar_one_or_none()
+    if new_hero is None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail="Already Exist Hero")
 
-    # add to database
-    session.add(hero)
     session.commit()
-    session.refresh(hero)
     return {"result": "ok",
             "msg": "success to register a new hero",
-            "data": hero}
+            "data": new_hero}
 
 
 @app.put(path="/hero/{id}",
@@ -115,18 +186,18 @@ async def add_hero(hero: HeroInput,
 async def update_hero(id: Annotated[int, Path(gt=0)],
                       hero: HeroUpdateInput,
                       session: Session = Depends(get_session)):
-    exist_hero = session.exec(select(Hero).where(Hero.id == id)).one_or_none()
+    new_info = hero.model_dump(exclude_unset=True)
+    if new_info:
+        statement = update(Hero).where(Hero.id == id).values(**new_info).returning(Hero)
+        exist_hero = session.exec(statement).scalars().first()
+    else:
+        # empty body only reads the hero
+        exist_hero = session.exec(select(Hero).where(Hero.id == id)).first()
     if exist_hero is None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail=f"There is no hero with id '{id}'")
 
-    new_info = hero.model_dump(exclude_unset=True)
-    for key, value in new_info.items():
-        setattr(exist_hero, key, value)
-
-    session.add(exist_hero)
     session.commit()
-    session.refresh(exist_hero)
     return {"result": "ok",
             "msg": "success to update a new hero",
             "data": exist_hero}
@@ -136,12 +207,46 @@ async def update_hero(id: Annotated[int, Path(gt=0)],
             summary="Delete Hero")
 async def delete_hero(id: Annotated[int, Path(gt=0)],
                       session: Session = Depends(get_session)):
-    exist_hero = session.exec(select(Hero).where(Hero.id == id)).one_or_none()
-    if exist_hero is None:
+    deleted_id = session.exec(delete(Hero).where(Hero.id == id).returning(Hero.id)).scalar_one_or_none()
+    if deleted_id is None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail=f"There is no hero with id '{id}'")
 
-    session.delete(exist_hero)
     session.commit()
     return {"result": "ok",
-            "msg": "success to remove hero"}
\ No newline at end of file
+            "msg": "success to remove hero"}
+
+
+# Batch Import / Export
+IMPORT_BATCH_SIZE: int = 5000
+EXPORT_BATCH_SIZE: int = 5000
+HERO_FIELDS: list[str] = ["id", "name", "age", "secret_name"]
+
+def insert_heroes(rows: list[dict]) -> int:
+    # one executemany per batch, existing names are skipped
+    with engine.begin() as conn:
+        statement = insert(Hero.__table__).on_conflict_do_nothing(index_elements=["name"])
+        return conn.execute(statement, rows).rowcount
+
+
+@app.post(path="/hero/import",
+          tags=["sqlite_test"],
+          summary="Import heroes from NDJSON or CSV body",
+          openapi_extra={"requestBody": {"required": True,
+                                         "content": {media_type: {} for media_type in MEDIA_TYPES.values()}}})
+async def import_hero(request: Request):
+    counts = await import_records(request=request, model=HeroInput, write_batch=insert_heroes, batch_size=IMPORT_BATCH_SIZE)
+    return {"result": "ok",
+            "msg": "success to import heroes",
+            **counts}
+
+@app.get(path="/hero/export",
+         tags=["sqlite_test"],
+         summary="Export every hero as NDJSON or CSV")
+async def export_hero(format: BulkFormat = "ndjson"):
+    return StreamingResponse(content=stream_rows(engine=engine,
+                                                 statement=select(Hero.__table__).order_by(Hero.id),
+                                                 bulk_format=format,
+                                                 fields=HERO_FIELDS,
+                                                 batch_size=EXPORT_BATCH_SIZE),
+                             media_type=MEDIA_TYPES[format])
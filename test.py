@@ -1,20 +1,64 @@
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends, HTTPException, status, Path, Query, Body
 from fastapi.responses import RedirectResponse, JSONResponse
 from fastapi.encoders import jsonable_encoder
-from typing import Annotated
+from itertools import islice
+from typing import Annotated, Literal
 from pydantic import BaseModel
 
+from durable_store import DurableItemStore
+from item_store import ItemStore
+from metrics import MetricsMiddleware, router as metrics_router
+from response_cache import CachedRoute, cached_response
 
-app = FastAPI(title="My API Test")
 
-# dummy data
-items: dict = {
-    1: {"item": "watch", "price": 1000, "manufacturer": "casio"},
-    2: {"item": "gaming labtop", "price": 5000, "manufacturer": "toshiba"},
-    3: {"item": "chair", "price": 4000, "manufacturer": "IKEA"},
-    4: {"item": "tire", "price": 800, "manufacturer": "michelline"}
-}
+# dummy data (initial items of an empty store)
+dummy_items: list[dict] = [
+    {"id": 1, "item": "watch", "price": 1000, "manufacturer": "casio"},
+    {"id": 2, "item": "gaming labtop", "price": 5000, "manufacturer": "toshiba"},
+    {"id": 3, "item": "chair", "price": 4000, "manufacturer": "IKEA"},
+    {"id": 4, "item": "tire", "price": 800, "manufacturer": "michelline"}
+]
 
+# item store from env var
+# - ITEM_STORE: 'durable' (snapshot + append-only log in ITEM_STORE_DIR) or 'memory'
+# - ITEM_SNAPSHOT_EVERY: number of writes between snapshots
+if os.getenv("ITEM_STORE", "durable") == "durable":
+    items: ItemStore = DurableItemStore(directory=os.getenv("ITEM_STORE_DIR", "./test_items"),
+                                        snapshot_every=int(os.getenv("ITEM_SNAPSHOT_EVERY", "100000")),
+                                        sorted_indexes=["price"])
+else:
+    items: ItemStore = ItemStore(sorted_indexes=["price"])
+
+if items.last_id == 0:
+    for dummy_item in dummy_items:
+        items.add(dict(dummy_item))
+
+@asynccontextmanager
+async def item_store_lifespan(app: FastAPI):
+    await items.commit()
+    yield
+    await items.commit()
+
+
+app = FastAPI(title="My API Test", lifespan=item_store_lifespan)
+app.add_middleware(MetricsMiddleware)
+app.include_router(router=metrics_router)
+# endpoints with @cached_response are served from rendered bytes
+app.router.route_class = CachedRoute
+
+
+def item_data(item: dict) -> dict:
+    # items in responses are keyed by id, so 'id' is not repeated in the item
+    return {k: v for k, v in item.items() if k != "id"}
+
+def check_item_id(item_id: Annotated[int, Path(title="item id", gt=0)]) -> int:
+    # upper bound is checked per request, since items are added after startup
+    if item_id > items.last_id:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                            detail=f"item_id must be less than or equal to {items.last_id}")
+    return item_id
 
 
 class ResponseForm(BaseModel):
@@ -53,6 +97,7 @@ class ItemManRequest(BaseModel):
          tags=["Health Check"],
          summary="Validate whether this API can be used or not.",
          response_model=ResponseForm)
+@cached_response(max_age=60)
 async def health_check() -> ResponseForm:
     return ResponseForm(detail="You can use this API.")
 
@@ -62,21 +107,42 @@ async def health_check() -> ResponseForm:
         response_model=ItemResponseForm,
          response_model_exclude_unset=False)
 async def get_data(item_id: int):
-    if item_id not in items.keys():
+    item = items.get(item_id)
+    if item is None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail=f"There is no item with id {item_id}")
     return ItemResponseForm(msg="OK",
                             detail="Success to get item",
-                            data=items[item_id])
+                            data=item_data(item))
+
+@app.get(path="/data/item/",
+         tags=["Items"],
+         summary="Get items in price range, sorted by price",
+         response_model=ItemResponseForm)
+async def get_items_by_price(min_price: Annotated[int | None, Query(ge=0)] = None,
+                             max_price: Annotated[int | None, Query(ge=0)] = None,
+                             sort: Annotated[Literal["price_asc", "price_desc"], Query()] = "price_asc",
+                             limit: Annotated[int, Query(ge=1, le=1000)] = 100):
+    # range scan on the price index: O(log n + k), e.g. sort=price_asc&limit=3 is the 3 cheapest items
+    found = islice(items.range("price", min_price, max_price, desc=(sort == "price_desc")), limit)
+    data = {item["id"]: item_data(item) for item in found}
+    return ItemResponseForm(detail="Success to get items",
+                            count=len(data),
+                            data=data)
 
 @app.post(path="/data/item/",
           tags=["Items"],
           summary="Register new item")
 async def add_new_item(item: Annotated[ItemRequest, Body(embed=True)]):
-    new_item_id = len(items.keys()) + 1
+    added: dict | None = None
     try:
-        items.update({new_item_id: jsonable_encoder(item)})
+        # id is allocated by the store, and never reused after delete
+        added = items.add(jsonable_encoder(item))
+        await items.commit()
     except Exception:
+        # not to serve (or persist by a later commit) an item whose commit failed
+        if added is not None:
+            items.delete(added["id"])
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                             detail="Fail to add new item due to the internal error.")
     return ResponseForm(detail="Success to add new item")
@@ -84,7 +150,7 @@ async def add_new_item(item: Annotated[ItemRequest, Body(embed=True)]):
 @app.put(path="/data/item/{item_id}",
          tags=["Items"],
          summary="Update registered item")
-async def update_item(item_id: Annotated[int, Path(title="item id", gt=0, le=max(items.keys()))],
+async def update_item(item_id: Annotated[int, Depends(check_item_id)],
                       item: Annotated[ItemRequest, Body(#embed=True,
                                                         openapi_examples={
                                                             "normal": {
@@ -107,31 +173,36 @@ async def update_item(item_id: Annotated[int, Path(title="item id", gt=0, le=max
                                                             },
                                                         }
                                                         )]):
-    if item_id not in items.keys():
+    updated = items.update(item_id, jsonable_encoder(item))
+    if updated is None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail=f"There is no item with id {item_id}")
-    items[item_id] = jsonable_encoder(item)
+    await items.commit()
     return ItemResponseForm(detail=f"Success to update item '{item_id}'",
-                            data=items[item_id])
+                            data=item_data(updated))
 
 @app.patch(path="/data/item/{item_id}",
            tags=["Items"],
            summary="Update only manufacturer for one item")
-async def update_manufacturer(item_id: Annotated[int, Path(title="item id", gt=0, le=max(items.keys()))],
+async def update_manufacturer(item_id: Annotated[int, Depends(check_item_id)],
                               manufacturer: Annotated[str, Body(embed=True)]):
-    items[item_id].update({"manufacturer": manufacturer})
+    updated = items.update(item_id, {"manufacturer": manufacturer})
+    if updated is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"There is no item with id {item_id}")
+    await items.commit()
     return ItemResponseForm(detail=f"Success to update manufacturer for item '{item_id}'",
-                            data=items[item_id])
+                            data=item_data(updated))
 
 @app.delete(path="/data/item/{item_id}",
             tags=["Items"],
             summary="Delete registered item",
             status_code=status.HTTP_204_NO_CONTENT)
-async def delete_item(item_id: Annotated[int, Path(title="item id", gt=0, le=max(items.keys()))]):
-    if item_id not in items.keys():
+async def delete_item(item_id: Annotated[int, Depends(check_item_id)]):
+    if items.delete(item_id) is None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail=f"There is no item with id {item_id}")
-    del items[item_id]
+    await items.commit()
     return None
 
 @app.get(path="/get/items/",
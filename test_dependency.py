@@ -2,7 +2,10 @@ from fastapi import FastAPI, Depends, Body, Query, Path, HTTPException, status
 from fastapi.responses import JSONResponse
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel, AfterValidator
-from typing import Annotated
+from itertools import islice
+from typing import Annotated, Literal
+
+from item_store import ItemStore
 
 dummy_items = [
     {"id": 1, "product": "cellphone", "price": 1000, "manufacturer": "NOKIA"},
@@ -16,29 +19,30 @@ dummy_items = [
     {"id": 9, "product": "HDD", "price": 200, "manufacturer": "Toshiba"},
 ]
 
-max_id : int = 9
+# items indexed by id, and sorted by price
+items = ItemStore(dummy_items, sorted_indexes=["price"])
 
 def check_item_id(item_id: int):
-    if item_id > max_id or item_id <= 0:
+    if item_id > items.last_id or item_id <= 0:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail=f"item_id is over the range.")
     return item_id
 
 def search_item(item_id: int) -> dict:
-    for i in dummy_items:
-        if i.get("id") == item_id:
-            return i
+    item = items.get(item_id)
+    if item is not None:
+        return item
 
     raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                         detail=f"There is no item with id '{item_id}'")
 
 
-def query_f(q: str | None, start_idx: int = 0, end_idx: int = max_id ):
+def query_f(q: str | None, start_idx: int = 0, end_idx: int | None = None):
     return {"q": q, "start_idx": start_idx, "end_idx": end_idx}
 
 
 class QueryF:
-    def __init__(self, q: str | None, start_idx: int = 0, end_idx: int = 0):
+    def __init__(self, q: str | None = None, start_idx: int = 0, end_idx: int = 0):
         self.q = q
         self.start_idx = start_idx
         self.end_idx = end_idx
@@ -60,16 +64,28 @@ app = FastAPI(title="Dependency Test")
          tags=["Items"],
          summary="get all items",
          response_model=list[ItemResponse])
-async def get_all_items(commons=Depends(QueryF)):
-    if commons.q is None:
-        return dummy_items
-
-    result = []
-    for i in dummy_items:
-        if i.get("product") == commons.q:
-            result.append(i)
-
-    return result
+async def get_all_items(commons=Depends(QueryF),
+                        min_price: Annotated[int | None, Query(ge=0)] = None,
+                        max_price: Annotated[int | None, Query(ge=0)] = None,
+                        sort: Annotated[Literal["price_asc", "price_desc"] | None, Query()] = None,
+                        limit: Annotated[int | None, Query(ge=1)] = None):
+    if min_price is None and max_price is None and sort is None:
+        result = iter(items)
+    else:
+        # range scan on the sorted price index: O(log n + k), no sort per request
+        result = items.range("price", min_price, max_price, desc=(sort == "price_desc"))
+
+    if commons.q is not None:
+        result = (i for i in result if i.get("product") == commons.q)
+
+    return list(islice(result, limit))
+
+@app.post(path="/items/",
+          tags=["Items"],
+          summary="register new item",
+          response_model=ItemRequest)
+async def add_item(item: Annotated[ItemResponse, Body(embed=True)]):
+    return items.add(jsonable_encoder(item))
 
 @app.get(path="/items/{item_id}/",
          tags=["Items"],
@@ -85,15 +101,14 @@ async def get_item(item_id: item_id_validator):
          response_model=ItemResponse)
 async def update_item(item_id: item_id_validator,
                       item: Annotated[ItemResponse, Body(embed=True)]):
-    returned_item = search_item(item_id=item_id)
-    returned_item.update(**jsonable_encoder(item))
-    return returned_item
+    search_item(item_id=item_id)
+    return items.update(item_id, jsonable_encoder(item))
 
 @app.delete(path="/items/{item_id}/",
             tags=["Items"],
             status_code=status.HTTP_202_ACCEPTED,
             summary="Delete registered item")
 async def delete_item(item_id: item_id_validator):
-    returned_item = search_item(item_id=item_id)
-    del dummy_items[dummy_items.index(returned_item)]
+    search_item(item_id=item_id)
+    items.delete(item_id)
     return JSONResponse(content={"result": "ok", "msg": f"Success to remove item id '{item_id}'"})
@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+import durable_store
+from durable_store import DurableItemStore
+
+
+def test_failed_flush_fails_the_store(tmp_path, monkeypatch):
+    store = DurableItemStore(directory=str(tmp_path))
+    store.add({"name": "a"})
+    store.flush()
+
+    def fail_fsync(fd: int):
+        raise OSError("EIO")
+
+    store.add({"name": "b"})
+    monkeypatch.setattr(durable_store.os, "fsync", fail_fsync)
+    with pytest.raises(OSError):
+        store.flush()
+
+    # a later flush must not report 'b' (or anything after it) as durable
+    monkeypatch.undo()
+    store.add({"name": "c"})
+    with pytest.raises(OSError):
+        store.flush()
+
+
+def test_torn_last_record_is_cut_off(tmp_path):
+    store = DurableItemStore(directory=str(tmp_path))
+    store.add({"name": "a"})
+    store.add({"name": "b"})
+    store.close()
+
+    log = os.path.join(tmp_path, "log.00000000.jsonl")
+    with open(log, "ab") as f:
+        f.write(b'{"op": "put", "item": {"na')
+
+    reloaded = DurableItemStore(directory=str(tmp_path))
+    assert [item["name"] for item in reloaded] == ["a", "b"]
+    reloaded.add({"name": "c"})
+    reloaded.close()
+    assert [item["name"] for item in DurableItemStore(directory=str(tmp_path))] == ["a", "b", "c"]
+
+
+def test_corrupt_record_before_the_end_raises(tmp_path):
+    store = DurableItemStore(directory=str(tmp_path))
+    store.add({"name": "a"})
+    store.add({"name": "b"})
+    store.close()
+
+    log = os.path.join(tmp_path, "log.00000000.jsonl")
+    with open(log, "rb") as f:
+        _, second = f.read().splitlines(keepends=True)
+    with open(log, "wb") as f:
+        f.write(b"garbage\n" + second)
+
+    with pytest.raises(ValueError, match="corrupt record"):
+        DurableItemStore(directory=str(tmp_path))
@@ -0,0 +1,78 @@
+import sys
+import asyncio
+import importlib
+
+import httpx
+import jwt
+import pytest
+
+from jwks_cache import JWKSCache
+
+
+JWKS_URL: str = "http://issuer/.well-known/jwks.json"
+
+
+@pytest.fixture
+def oidc(tmp_path, monkeypatch):
+    # keys are written to JWT_KEY_DIR on import, so it is imported again with a temp dir
+    monkeypatch.setenv("JWT_KEY_DIR", str(tmp_path / "jwt_keys"))
+    monkeypatch.delitem(sys.modules, "oidc", raising=False)
+    return importlib.import_module("oidc")
+
+
+def rotate_key(oidc):
+    oidc.add_key(oidc.KEY_DIR)
+    oidc.key_ring.load(oidc.KEY_DIR)
+
+
+def issue_auth_token(oidc) -> str:
+    return oidc.create_token(payload={"sub": "alex@test.com",
+                                      "aud": "client-tester-12345",
+                                      "exp": 2 ** 31 - 1})
+
+
+def test_decode_after_key_rotation(oidc):
+    async def run():
+        jwks = JWKSCache(JWKS_URL, min_refresh_seconds=0, transport=httpx.ASGITransport(app=oidc.app))
+        before = issue_auth_token(oidc)
+        assert (await jwks.decode(before, audience="client-tester-12345"))["sub"] == "alex@test.com"
+
+        # token signed by the new key has unknown kid, so keys are fetched again
+        rotate_key(oidc)
+        after = issue_auth_token(oidc)
+        assert jwt.get_unverified_header(after)["kid"] not in jwks.keys
+        assert (await jwks.decode(after, audience="client-tester-12345"))["sub"] == "alex@test.com"
+        assert (await jwks.decode(before, audience="client-tester-12345"))["sub"] == "alex@test.com"
+
+        # retired key is removed from JWKS
+        for _ in range(oidc.KEY_RING_SIZE):
+            rotate_key(oidc)
+        await jwks.refresh(force=True)
+        with pytest.raises(jwt.InvalidKeyError):
+            await jwks.decode(before, audience="client-tester-12345")
+
+    asyncio.run(run())
+
+
+def test_background_refresh_survives_invalid_response(oidc):
+    responses = [httpx.Response(200, text="<html>maintenance</html>"),
+                 httpx.Response(200, json=["not", "jwks"]),
+                 httpx.Response(200, content=oidc.key_ring.jwks)]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return responses.pop(0) if len(responses) > 1 else responses[0]
+
+    async def run():
+        jwks = JWKSCache(JWKS_URL, refresh_seconds=0.01, transport=httpx.MockTransport(handler))
+        jwks.start()
+        try:
+            for _ in range(100):
+                if jwks.keys:
+                    break
+                await asyncio.sleep(0.01)
+            assert not jwks._task.done()
+            assert (await jwks.decode(issue_auth_token(oidc), audience="client-tester-12345"))["sub"] == "alex@test.com"
+        finally:
+            await jwks.stop()
+
+    asyncio.run(run())
@@ -0,0 +1,42 @@
+import time
+
+from sqlalchemy import create_engine
+from sqlmodel import Session
+
+from revocation import RevocationList, RevokedToken
+
+
+def make_worker_list(path) -> RevocationList:
+    return RevocationList(engine=create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False}),
+                          sync_interval=0)
+
+
+def test_revocation_is_visible_to_other_worker(tmp_path):
+    path = tmp_path / "revocation.db"
+    worker1, worker2 = make_worker_list(path), make_worker_list(path)
+
+    worker1.revoke("a", expire_at=time.time() + 60)
+    assert worker2.is_revoked("a")
+    assert not worker2.is_revoked("b")
+
+
+def test_late_commit_is_synced(tmp_path):
+    path = tmp_path / "revocation.db"
+    worker1, worker2 = make_worker_list(path), make_worker_list(path)
+    worker1.revoke("a", expire_at=time.time() + 60)
+    worker2.sync()
+
+    # row stamped before the last sync, committed after it (e.g. concurrent revokers on PostgreSQL)
+    with Session(worker1.engine) as session:
+        session.add(RevokedToken(jti="late", expire_at=time.time() + 60, created_at=time.time() - 5))
+        session.commit()
+
+    assert worker2.is_revoked("late")
+
+
+def test_duplicate_revoke(tmp_path):
+    path = tmp_path / "revocation.db"
+    worker1, worker2 = make_worker_list(path), make_worker_list(path)
+    worker1.revoke("a", expire_at=time.time() + 60)
+    worker2.revoke("a", expire_at=time.time() + 60)
+    assert worker1.is_revoked("a") and worker2.is_revoked("a")
@@ -0,0 +1,38 @@
+import time
+
+from sqlalchemy import create_engine
+
+from session_store import SQLSessionStore
+
+
+def make_worker_store(path) -> SQLSessionStore:
+    # each worker process has its own engine on the shared DB
+    return SQLSessionStore(engine=create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False}),
+                           sweep_interval=0)
+
+
+def test_sessions_are_shared_between_workers(tmp_path):
+    path = tmp_path / "sessions.db"
+    worker1, worker2 = make_worker_store(path), make_worker_store(path)
+
+    session_id = worker1.create(username="testuser1", ttl=60)
+    assert worker2.get(session_id) == "testuser1"
+    assert worker2.has_user("testuser1")
+
+    worker2.delete(session_id)
+    assert worker1.get(session_id) is None
+    assert not worker1.has_user("testuser1")
+
+
+def test_expired_sessions_are_hidden_and_swept(tmp_path):
+    path = tmp_path / "sessions.db"
+    worker1, worker2 = make_worker_store(path), make_worker_store(path)
+
+    expired = worker1.create(username="testuser2", ttl=0.05)
+    time.sleep(0.1)
+    assert worker2.get(expired) is None
+    assert not worker2.has_user("testuser2")
+
+    # create() of the other worker sweeps the expired row
+    worker2.create(username="testuser3", ttl=60)
+    assert worker1.sweep() == 0
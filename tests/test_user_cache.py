@@ -0,0 +1,87 @@
+import sys
+import time
+import asyncio
+import importlib
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.cache import RedisCache
+
+
+@pytest.fixture
+def app_module(tmp_path, monkeypatch):
+    # app.dependencies reads DB_URL on import, so app is imported again with a temp SQLite DB
+    monkeypatch.setenv("DB_URL", f"sqlite:///{tmp_path / 'users.db'}")
+    monkeypatch.setenv("DB_ASYNC", "0")
+    for name in [name for name in sys.modules if name == "app" or name.startswith("app.")]:
+        monkeypatch.delitem(sys.modules, name)
+    return importlib.import_module("app.main")
+
+
+class FakeRedis:
+    """In-process stand-in for redis.asyncio.Redis: get / set(ex=) / delete with expiry."""
+    def __init__(self):
+        self.data: dict[str, tuple[float, bytes]] = {}
+        self.calls: list[tuple] = []
+
+    async def get(self, key: str) -> bytes | None:
+        self.calls.append(("get", key))
+        entry = self.data.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            self.data.pop(key, None)
+            return None
+        return entry[1]
+
+    async def set(self, key: str, value: bytes, ex: int | None = None):
+        self.calls.append(("set", key, ex))
+        self.data[key] = (time.monotonic() + ex if ex is not None else float("inf"), value)
+
+    async def delete(self, key: str):
+        self.calls.append(("delete", key))
+        self.data.pop(key, None)
+
+
+def test_redis_cache_backend():
+    async def run():
+        redis = FakeRedis()
+        cache = RedisCache(client=redis, ttl=0.2, prefix="user:")
+
+        assert await cache.get("a") is None
+        await cache.set("a", b"value")
+        assert await cache.get("a") == b"value"
+        assert ("set", "user:a", 1) in redis.calls          # TTL below 1 sec is rounded up to 1 sec
+
+        await cache.delete("a")
+        assert await cache.get("a") is None
+        assert (cache.stats.hits, cache.stats.misses) == (1, 2)
+
+    asyncio.run(run())
+
+
+def test_user_lookup_through_redis_cache(app_module):
+    # modules of the app imported by the fixture
+    from app.cache import RedisCache, get_user_cache
+    app = app_module.app
+    redis = FakeRedis()
+    cache = RedisCache(client=redis, ttl=60)
+    app.dependency_overrides[get_user_cache] = lambda: cache
+    try:
+        with TestClient(app) as client:
+            user = client.post("/users/", json={"username": f"cache-{time.time_ns()}",
+                                                "f_name": "first",
+                                                "l_name": "last",
+                                                "birthdate": "2000-01-01",
+                                                "password": "password"}).json()
+            # registration invalidates the key
+            assert ("delete", f"cache:{user['uuid']}") in redis.calls
+
+            first = client.get(f"/users/{user['uuid']}")
+            second = client.get(f"/users/{user['uuid']}")
+            assert first.json() == second.json() == user
+            assert f"cache:{user['uuid']}" in redis.data
+
+            stats = client.get("/users/cache/stats").json()
+            assert (stats["hits"], stats["misses"]) == (1, 1)
+    finally:
+        app.dependency_overrides.pop(get_user_cache, None)
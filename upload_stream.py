@@ -0,0 +1,343 @@
+import os
+import time
+import uuid
+import asyncio
+import hashlib
+import weakref
+import mimetypes
+from typing import AsyncIterator
+from fastapi import HTTPException, Request, UploadFile, status
+from pydantic import BaseModel
+from python_multipart.multipart import MultipartParser, MultipartState, parse_options_header
+from starlette.concurrency import run_in_threadpool
+
+
+# upload config from env var
+# - UPLOAD_DIR: directory to store uploaded files (file name is random, not from client)
+# - UPLOAD_MAX_SIZE: max size of one request body in bytes
+# - UPLOAD_CONCURRENCY: max files processed (hash, sniff, write) at the same time in this process
+# - UPLOAD_QUEUE_CHUNKS: max chunks of one file waiting to be written. receiving waits when it is full.
+UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", "./uploads")
+UPLOAD_MAX_SIZE: int = int(os.getenv("UPLOAD_MAX_SIZE", str(5 * 1024 ** 3)))
+UPLOAD_CONCURRENCY: int = int(os.getenv("UPLOAD_CONCURRENCY", "8"))
+UPLOAD_QUEUE_CHUNKS: int = int(os.getenv("UPLOAD_QUEUE_CHUNKS", "16"))
+UPLOAD_CHUNK_SIZE: int = 1024 * 1024
+
+# asyncio primitives can not be shared between event loops, so one semaphore per loop
+upload_semaphores: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+def get_upload_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    if loop not in upload_semaphores:
+        upload_semaphores[loop] = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+    return upload_semaphores[loop]
+
+# leading bytes of common file types. others are guessed from the file name.
+MAGIC_NUMBERS: list[tuple[bytes, str]] = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"%PDF-", "application/pdf"),
+    (b"PK\x03\x04", "application/zip"),
+    (b"\x1f\x8b", "application/gzip"),
+    (b"BZh", "application/x-bzip2"),
+    (b"\xfd7zXZ\x00", "application/x-xz"),
+    (b"7z\xbc\xaf\x27\x1c", "application/x-7z-compressed"),
+    (b"\x7fELF", "application/x-executable"),
+]
+
+
+class StoredFile(BaseModel):
+    field: str
+    filename: str
+    size: int
+    sha256: str
+    path: str
+
+
+class IngestedFile(StoredFile):
+    index: int                  # order of the file in the request
+    media_type: str             # sniffed from content
+    seconds: float
+    throughput: float           # bytes per second
+
+
+class PartWriter:
+    """
+    Hash and write one file part. Every call runs in a worker thread, so the event loop is not blocked by disk.
+    """
+    def __init__(self, field: str, filename: str, upload_dir: str):
+        self.field = field
+        self.filename = filename
+        self.path = os.path.join(upload_dir, uuid.uuid4().hex)
+        self.size: int = 0
+        self.digest = hashlib.sha256()
+        self.file = None
+
+    def open(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.file = open(self.path, "wb")
+
+    def write(self, data: bytes):
+        self.digest.update(data)
+        self.file.write(data)
+        self.size += len(data)
+
+    def close(self) -> StoredFile:
+        self.file.close()
+        return StoredFile(field=self.field,
+                          filename=self.filename,
+                          size=self.size,
+                          sha256=self.digest.hexdigest(),
+                          path=self.path)
+
+    def discard(self):
+        # called after a failed write / close (e.g. ENOSPC), so closing may fail again
+        try:
+            if self.file is not None:
+                self.file.close()
+        except OSError:
+            pass
+        finally:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+def multipart_openapi(field: str, multiple: bool = False) -> dict:
+    # request body of the endpoint is read by receive_files(), so describe it for the docs by hand
+    schema: dict = {"type": "string", "format": "binary"}
+    if multiple:
+        schema = {"type": "array", "items": schema}
+    return {"requestBody": {"required": True,
+                            "content": {"multipart/form-data": {"schema": {"type": "object",
+                                                                           "properties": {field: schema},
+                                                                           "required": [field]}}}}}
+
+def get_boundary(request: Request) -> bytes:
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or not options.get(b"boundary"):
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                            detail="Content-Type must be 'multipart/form-data' with boundary")
+    return options[b"boundary"]
+
+def check_content_length(request: Request, max_size: int):
+    # reject before reading any byte if client already said the body is too large
+    content_length = request.headers.get("content-length")
+    if content_length is not None and content_length.isdigit() and int(content_length) > max_size:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"Request body must not be larger than {max_size} bytes")
+
+
+async def iter_part_events(request: Request, max_size: int) -> AsyncIterator[tuple]:
+    """
+    Parse multipart body chunk by chunk and yield events of parts:
+    ('begin', headers: dict[bytes, bytes]), ('data', bytes), ('end',).
+    Only one chunk of the body is kept in memory.
+    """
+    events: list[tuple] = []
+    headers: dict[bytes, bytes] = {}
+    header: list[bytes] = [b"", b""]
+
+    def on_header_field(data: bytes, start: int, end: int):
+        header[0] += data[start:end]
+
+    def on_header_value(data: bytes, start: int, end: int):
+        header[1] += data[start:end]
+
+    def on_header_end():
+        headers[header[0].lower()] = header[1]
+        header[0] = header[1] = b""
+
+    def on_headers_finished():
+        events.append(("begin", dict(headers)))
+        headers.clear()
+
+    def on_part_data(data: bytes, start: int, end: int):
+        events.append(("data", data[start:end]))
+
+    def on_part_end():
+        events.append(("end",))
+
+    parser = MultipartParser(boundary=get_boundary(request),
+                             callbacks={"on_header_field": on_header_field,
+                                        "on_header_value": on_header_value,
+                                        "on_header_end": on_header_end,
+                                        "on_headers_finished": on_headers_finished,
+                                        "on_part_data": on_part_data,
+                                        "on_part_end": on_part_end})
+    received: int = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > max_size:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                                detail=f"Request body must not be larger than {max_size} bytes")
+        parser.write(chunk)
+        for event in events:
+            yield event
+        events.clear()
+
+    parser.finalize()
+    if parser.state != MultipartState.END:
+        raise ValueError("Multipart body is not completed")
+
+
+def sniff_media_type(head: bytes, filename: str) -> str:
+    for magic, media_type in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return media_type
+    return mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+
+async def ingest(index: int, field: str, filename: str, chunks: AsyncIterator[bytes], upload_dir: str) -> IngestedFile:
+    """
+    Sniff, hash and write one file from chunks. Disk writes and hashing run in worker threads,
+    so several files are processed in parallel.
+    """
+    start = time.perf_counter()
+    writer = PartWriter(field=field, filename=filename, upload_dir=upload_dir)
+    media_type: str | None = None
+    try:
+        await run_in_threadpool(writer.open)
+        async for chunk in chunks:
+            if media_type is None:
+                media_type = sniff_media_type(chunk, filename)
+            await run_in_threadpool(writer.write, chunk)
+        stored = await run_in_threadpool(writer.close)
+    except BaseException:
+        writer.discard()
+        raise
+
+    seconds = time.perf_counter() - start
+    return IngestedFile(**stored.model_dump(),
+                        index=index,
+                        media_type=media_type or sniff_media_type(b"", filename),
+                        seconds=seconds,
+                        throughput=stored.size / seconds if seconds > 0 else 0.0)
+
+
+async def iter_queue(queue: asyncio.Queue) -> AsyncIterator[bytes]:
+    while (chunk := await queue.get()) is not None:
+        yield chunk
+
+async def iter_upload_file(file: UploadFile) -> AsyncIterator[bytes]:
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        yield chunk
+
+
+async def receive_parts(request: Request,
+                        max_size: int = UPLOAD_MAX_SIZE,
+                        upload_dir: str = UPLOAD_DIR) -> set[asyncio.Task]:
+    """
+    Receive multipart body and process every file part in its own task. Tasks may still run when this returns.
+
+    Parts arrive one after another, but the chunks of a part are handed to its task through a bounded queue,
+    so receiving the next part overlaps hashing and writing of the previous ones.
+    Backpressure: receiving waits when the queue of a part is full. A part waiting for one of UPLOAD_CONCURRENCY slots
+    does not take chunks, so its queue gets full soon.
+    If the body is too large or broken, the tasks are cancelled and their files are removed.
+    """
+    check_content_length(request, max_size)
+
+    async def run(index: int, field: str, filename: str, queue: asyncio.Queue) -> IngestedFile:
+        ended: bool = False
+
+        async def chunks() -> AsyncIterator[bytes]:
+            nonlocal ended
+            async for chunk in iter_queue(queue):
+                yield chunk
+            ended = True
+
+        async with get_upload_semaphore():
+            try:
+                return await ingest(index, field, filename, chunks(), upload_dir)
+            except Exception:
+                # keep taking chunks until the end of the part, so receiving is not blocked by the full queue.
+                # nothing is left when ingest() failed after the end (e.g. close() with ENOSPC)
+                while not ended and await queue.get() is not None:
+                    pass
+                raise
+
+    tasks: set[asyncio.Task] = set()
+    queue: asyncio.Queue | None = None
+    try:
+        async for event in iter_part_events(request, max_size):
+            if event[0] == "begin":
+                _, options = parse_options_header(event[1].get(b"content-disposition", b""))
+                if b"filename" in options:
+                    queue = asyncio.Queue(maxsize=UPLOAD_QUEUE_CHUNKS)
+                    tasks.add(asyncio.create_task(run(index=len(tasks),
+                                                      field=options.get(b"name", b"").decode(),
+                                                      filename=options[b"filename"].decode(),
+                                                      queue=queue)))
+            elif event[0] == "data" and queue is not None:
+                await queue.put(event[1])
+            elif event[0] == "end" and queue is not None:
+                await queue.put(None)
+                queue = None
+
+    except BaseException as e:
+        await cancel_parts(tasks)
+        if isinstance(e, HTTPException) or not isinstance(e, Exception):
+            raise
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="There was an error parsing the body") from e
+
+    return tasks
+
+async def cancel_parts(tasks: set[asyncio.Task]):
+    # running tasks remove their own file when cancelled
+    for task in tasks:
+        task.cancel()
+    for result in await asyncio.gather(*tasks, return_exceptions=True):
+        if isinstance(result, IngestedFile):
+            os.remove(result.path)
+
+async def iter_completed(tasks: set[asyncio.Task]) -> AsyncIterator[IngestedFile | BaseException]:
+    """yield result (or exception) of each task as soon as it is done"""
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.exception() or task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def ingest_upload_files(files: list[UploadFile], upload_dir: str = UPLOAD_DIR) -> list[IngestedFile]:
+    """
+    Process already received (spooled) files concurrently, at most UPLOAD_CONCURRENCY at once.
+    UploadFile is closed when the endpoint returns, so this can not be streamed in the response.
+    """
+    async def run(index: int, file: UploadFile) -> IngestedFile:
+        async with get_upload_semaphore():
+            return await ingest(index, "files", file.filename or "", iter_upload_file(file), upload_dir)
+
+    results = await asyncio.gather(*[run(index, file) for index, file in enumerate(files)], return_exceptions=True)
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        for result in results:
+            if isinstance(result, IngestedFile):
+                os.remove(result.path)
+        raise errors[0]
+    return results
+
+
+async def receive_files(request: Request,
+                        max_size: int = UPLOAD_MAX_SIZE,
+                        upload_dir: str = UPLOAD_DIR) -> list[IngestedFile]:
+    """
+    Store every file part of multipart body into 'upload_dir' while it is being received.
+    Size and sha256 are computed incrementally. Form fields without filename are skipped.
+    If the body is too large or broken, files written by this request are removed.
+    """
+    tasks = await receive_parts(request, max_size, upload_dir)
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        await cancel_parts(tasks)
+        raise errors[0]
+
+    return sorted(results, key=lambda file: file.index)
@@ -0,0 +1,119 @@
+from abc import ABC, abstractmethod
+from typing import Iterable
+from sqlalchemy import Engine
+from sqlmodel import SQLModel, Field, Session, select, update
+
+
+class UserRepository(ABC):
+    """
+    User store looked up by username or email through indexes (no full scan per request).
+    Users are plain dict with keys: username, password, first_name, last_name, email, department, is_login
+    """
+    @abstractmethod
+    def get_by_username(self, username: str) -> dict | None:
+        ...
+
+    @abstractmethod
+    def get_by_email(self, email: str) -> dict | None:
+        ...
+
+    @abstractmethod
+    def add(self, user: dict) -> None:
+        ...
+
+    @abstractmethod
+    def set_login(self, username: str, is_login: bool) -> None:
+        ...
+
+    @abstractmethod
+    def set_password(self, username: str, password: str) -> None:
+        ...
+
+    @abstractmethod
+    def all(self) -> list[dict]:
+        ...
+
+
+class InMemoryUserRepository(UserRepository):
+    """
+    Hash indexes on username and email (email is case-insensitive).
+    """
+    def __init__(self, users: Iterable[dict] = ()):
+        self._by_username: dict[str, dict] = {}
+        self._by_email: dict[str, dict] = {}
+        for user in users:
+            self.add(user)
+
+    def get_by_username(self, username: str) -> dict | None:
+        return self._by_username.get(username)
+
+    def get_by_email(self, email: str) -> dict | None:
+        return self._by_email.get(email.lower())
+
+    def add(self, user: dict) -> None:
+        if user["username"] in self._by_username or user["email"].lower() in self._by_email:
+            raise ValueError(f"User '{user['username']}' is already exist")
+
+        self._by_username[user["username"]] = user
+        self._by_email[user["email"].lower()] = user
+
+    def set_login(self, username: str, is_login: bool) -> None:
+        self._by_username[username]["is_login"] = is_login
+
+    def set_password(self, username: str, password: str) -> None:
+        self._by_username[username]["password"] = password
+
+    def all(self) -> list[dict]:
+        return list(self._by_username.values())
+
+
+class AuthUser(SQLModel, table=True):
+    __tablename__ = "auth_user"
+    id: int | None = Field(default=None, primary_key=True)
+    username: str = Field(index=True, unique=True)
+    email: str = Field(index=True, unique=True)       # stored in lower case
+    password: str
+    first_name: str
+    last_name: str
+    department: str
+    is_login: bool = False
+
+
+class SQLUserRepository(UserRepository):
+    """
+    Users in 'auth_user' table, looked up through unique indexes on username and email.
+    """
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        SQLModel.metadata.create_all(engine, tables=[AuthUser.__table__])
+
+    @staticmethod
+    def to_dict(user: AuthUser | None) -> dict | None:
+        return user.model_dump(exclude={"id"}) if user is not None else None
+
+    def get_by_username(self, username: str) -> dict | None:
+        with Session(self.engine) as session:
+            return self.to_dict(session.exec(select(AuthUser).where(AuthUser.username == username)).first())
+
+    def get_by_email(self, email: str) -> dict | None:
+        with Session(self.engine) as session:
+            return self.to_dict(session.exec(select(AuthUser).where(AuthUser.email == email.lower())).first())
+
+    def add(self, user: dict) -> None:
+        with Session(self.engine) as session:
+            session.add(AuthUser.model_validate({**user, "email": user["email"].lower()}))
+            session.commit()
+
+    def set_login(self, username: str, is_login: bool) -> None:
+        with Session(self.engine) as session:
+            session.exec(update(AuthUser).where(AuthUser.username == username).values(is_login=is_login))
+            session.commit()
+
+    def set_password(self, username: str, password: str) -> None:
+        with Session(self.engine) as session:
+            session.exec(update(AuthUser).where(AuthUser.username == username).values(password=password))
+            session.commit()
+
+    def all(self) -> list[dict]:
+        with Session(self.engine) as session:
+            return [self.to_dict(user) for user in session.exec(select(AuthUser).order_by(AuthUser.id))]